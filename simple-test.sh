@@ -31,8 +31,8 @@ setup_environment() {
     command -v sam >/dev/null || { print_error "SAM CLI not found - install AWS SAM CLI"; exit 1; }
     
     print_info "Installing Python testing libraries..."
-    # Install Python packages with educational feedback
-    pip install pytest pytest-cov boto3 requests
+    # Install Python packages with educational feedback (tests/requirements.txt lists everything the tests import)
+    pip install -r tests/requirements.txt pytest-cov
     
     print_success "Environment setup complete - ready for serverless development!"
 }
@@ -157,7 +157,7 @@ deploy_and_test() {
         
         if [ -d "tests/integration" ]; then
             print_info "Running integration tests against deployed API..."
-            if pytest tests/integration/ -v --tb=short; then
+            if pytest tests/integration/ -v --tb=short -n auto; then
                 print_success "Integration tests passed!"
             else
                 print_warning "Some integration tests failed - check the details above"
@@ -0,0 +1,97 @@
+import functools
+import os
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+"""
+Make sure env variable AWS_SAM_STACK_NAME exists with the name of the stack we are going to test. 
+"""
+
+# コールドスタートを吸収するためのウォームアップ用記事
+WARM_UP_ARTICLE_URL = "https://ja.wikipedia.org/wiki/Amazon_Web_Services"
+
+# Wikipedia記事の取得を伴うリクエストのタイムアウト（秒）
+# xdistの各ワーカーや並列リクエストはウォームアップ済みでないコンテナに振られ得るため、ウォームアップと同じ余裕を持たせる
+ARTICLE_FETCH_TIMEOUT = 20
+
+
+@functools.lru_cache(maxsize=1)
+def _cfn():
+    """ CloudFormation client, built lazily on first use and reused afterwards """
+    import boto3
+    return boto3.client("cloudformation")
+
+
+@functools.lru_cache(maxsize=1)
+def _resolve_api_url():
+    """ Resolve the API Gateway URL once per process (controller or xdist worker)
+
+    The WikipediaTocApi output of the AWS_SAM_STACK_NAME stack takes precedence over API_URL,
+    so the lookup works no matter which directory pytest was started from.
+    """
+    stack_name = os.environ.get("AWS_SAM_STACK_NAME")
+    if stack_name is None:
+        return os.environ.get("API_URL", "")
+
+    try:
+        response = _cfn().describe_stacks(StackName=stack_name)
+    except Exception as e:
+        raise Exception(
+            f"Cannot find stack {stack_name} \n" f'Please make sure a stack with the name "{stack_name}" exists'
+        ) from e
+
+    outputs = {o["OutputKey"]: o["OutputValue"] for o in response["Stacks"][0]["Outputs"]}
+
+    # Look for WikipediaTocApi specifically (this is a Wikipedia TOC project)
+    try:
+        return outputs["WikipediaTocApi"]
+    except KeyError:
+        raise KeyError(f"WikipediaTocApi not found in stack {stack_name}. Available outputs: {list(outputs)}") from None
+
+
+@pytest.fixture(scope="session")
+def http():
+    """ Shared keep-alive session so every integration test reuses one connection pool """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=Retry(total=0))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    # Warm up the Lambda container once before the tests run
+    api_url = _resolve_api_url()
+    if api_url:
+        try:
+            session.get(f"{api_url}?url={WARM_UP_ARTICLE_URL}", timeout=ARTICLE_FETCH_TIMEOUT)
+        except requests.exceptions.RequestException:
+            pass
+
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="session")
+def article_timeout():
+    """ Timeout for requests that make the API fetch a Wikipedia article (may include a cold start) """
+    return ARTICLE_FETCH_TIMEOUT
+
+
+@pytest.fixture(scope="session")
+def api_gateway_url():
+    """ Get the API Gateway URL resolved from the Cloudformation Stack """
+    url = _resolve_api_url()
+    if not url:
+        raise ValueError('Please set the AWS_SAM_STACK_NAME environment variable to the name of your stack')
+
+    return url
+
+
+@pytest.fixture(scope="session")
+def api_url():
+    """ API URL for the env-driven tests; skips them once when neither the stack nor API_URL is set """
+    url = _resolve_api_url()
+    if not url:
+        pytest.skip("API_URL環境変数が設定されていません")
+    return url
@@ -1,49 +1,45 @@
-import pytest
-import requests
-import os
+import asyncio
 
-def test_wikipedia_toc_api_basic():
-    """Wikipedia TOC API Gatewayエンドポイントの基本テスト"""
-    api_url = os.environ.get('API_URL', '')
-    if not api_url:
-        pytest.skip("API_URL環境変数が設定されていません")
-    
-    print(f"Testing Wikipedia TOC API: {api_url}")
-    
-    # Valid Wikipedia URL for testing
-    test_url = "https://ja.wikipedia.org/wiki/Amazon_Web_Services"
-    response = requests.get(f"{api_url}?url={test_url}", timeout=15)
-    assert response.status_code == 200
-    
-    # JSONレスポンスの検証
-    json_response = response.json()
-    assert 'success' in json_response
-    assert json_response['success'] is True
-    assert 'toc' in json_response
-    assert 'title' in json_response
-    assert 'total_items' in json_response
-    print(f"Response: {json_response}")
+import httpx
+import orjson
 
-def test_wikipedia_toc_api_response_format():
-    """Wikipedia TOC APIレスポンス形式の検証"""
-    api_url = os.environ.get('API_URL', '')
-    if not api_url:
-        pytest.skip("API_URL環境変数が設定されていません")
-    
-    # Valid Wikipedia URL for testing
-    test_url = "https://ja.wikipedia.org/wiki/Amazon_Web_Services"
-    response = requests.get(f"{api_url}?url={test_url}", timeout=15)
-    assert response.status_code == 200
-    
-    # Content-Typeがjsonであることを確認
-    content_type = response.headers.get('content-type', '')
-    assert 'application/json' in content_type.lower()
+# エラーメッセージの期待キーワード
+_INV_NS_ERR = frozenset(("wikipedia", "url", "invalid", "not allowed", "forbidden"))
+
+# 有効なWikipedia URL（並列にリクエストする）
+VALID_ARTICLE_URLS = (
+    "https://ja.wikipedia.org/wiki/Amazon_Web_Services",
+    "https://en.wikipedia.org/wiki/Python_(programming_language)",
+)
+
+
+async def _fetch(client, api_url, test_url):
+    return await client.get(api_url, params={"url": test_url})
+
+
+async def _fetch_all(api_url, test_urls, timeout):
+    limits = httpx.Limits(max_keepalive_connections=8)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        return await asyncio.gather(*(_fetch(client, api_url, u) for u in test_urls))
+
+
+def test_wikipedia_toc_api_parallel(api_url, http, article_timeout):
+    """有効なWikipedia記事への並列リクエストで基本動作・レスポンス形式・多言語対応を検証"""
+    # http フィクスチャに依存させ、セッション開始時のウォームアップを先に済ませる
+    # 並列リクエストはウォームアップ済みでない別コンテナに振られ得るため、記事取得用のタイムアウトを使う
+    responses = asyncio.run(_fetch_all(api_url, VALID_ARTICLE_URLS, article_timeout))
     
-    # Wikipedia TOC specific response structure validation
-    json_response = response.json()
-    assert 'success' in json_response
-    assert 'url' in json_response
-    if json_response['success']:
+    for test_url, response in zip(VALID_ARTICLE_URLS, responses):
+        assert response.status_code == 200
+        
+        # Content-Typeがjsonであることを確認
+        content_type = response.headers.get('content-type', '')
+        assert 'application/json' in content_type.lower()
+        
+        # Wikipedia TOC specific response structure validation
+        json_response = orjson.loads(response.content)
+        assert json_response['success'] is True
+        assert 'url' in json_response
         assert 'toc' in json_response
         assert 'title' in json_response
         assert 'total_items' in json_response
@@ -55,67 +51,41 @@ def test_wikipedia_toc_api_response_format():
             assert 'title' in toc_item
             assert 'anchor' in toc_item
 
-def test_wikipedia_toc_api_invalid_url():
+
+def test_wikipedia_toc_api_invalid_url(api_url, http):
     """無効なURLでのテスト"""
-    api_url = os.environ.get('API_URL', '')
-    if not api_url:
-        pytest.skip("API_URL環境変数が設定されていません")
-    
     test_url = "https://example.com/test"
-    response = requests.get(f"{api_url}?url={test_url}", timeout=10)
-    assert response.status_code == 400
+    with http.get(f"{api_url}?url={test_url}", timeout=3) as response:
+        assert response.status_code == 400
     
-    json_response = response.json()
-    assert 'success' in json_response
-    assert json_response['success'] is False
-    assert 'error' in json_response
+        json_response = orjson.loads(response.content)
+        assert 'success' in json_response
+        assert json_response['success'] is False
+        assert 'error' in json_response
 
-def test_wikipedia_toc_api_no_url():
+
+def test_wikipedia_toc_api_no_url(api_url, http):
     """URLパラメータなしのテスト"""
-    api_url = os.environ.get('API_URL', '')
-    if not api_url:
-        pytest.skip("API_URL環境変数が設定されていません")
-    
-    response = requests.get(api_url, timeout=10)
-    assert response.status_code == 400
+    with http.get(api_url, timeout=3) as response:
+        assert response.status_code == 400
     
-    json_response = response.json()
-    assert 'success' in json_response
-    assert json_response['success'] is False
-    assert 'error' in json_response
+        json_response = orjson.loads(response.content)
+        assert 'success' in json_response
+        assert json_response['success'] is False
+        assert 'error' in json_response
 
-def test_wikipedia_toc_api_forbidden_namespace():
+
+def test_wikipedia_toc_api_forbidden_namespace(api_url, http):
     """禁止されたWikipediaネームスペースでのテスト"""
-    api_url = os.environ.get('API_URL', '')
-    if not api_url:
-        pytest.skip("API_URL環境変数が設定されていません")
-    
     # 禁止されたネームスペース（ユーザーページ）
     test_url = "https://ja.wikipedia.org/wiki/利用者:TestUser"
-    response = requests.get(f"{api_url}?url={test_url}", timeout=10)
-    assert response.status_code == 400
-    
-    json_response = response.json()
-    assert 'success' in json_response
-    assert json_response['success'] is False
-    assert 'error' in json_response
-    # 実際のエラーメッセージに基づいて調整
-    error_msg = json_response['error'].lower()
-    assert any(keyword in error_msg for keyword in ['wikipedia', 'url', 'invalid', 'not allowed', 'forbidden'])
-
-def test_wikipedia_toc_api_multilingual():
-    """多言語Wikipedia記事でのテスト"""
-    api_url = os.environ.get('API_URL', '')
-    if not api_url:
-        pytest.skip("API_URL環境変数が設定されていません")
-    
-    # 英語Wikipedia記事
-    test_url = "https://en.wikipedia.org/wiki/Python_(programming_language)"
-    response = requests.get(f"{api_url}?url={test_url}", timeout=15)
-    assert response.status_code == 200
+    with http.get(f"{api_url}?url={test_url}", timeout=3) as response:
+        assert response.status_code == 400
     
-    json_response = response.json()
-    assert json_response['success'] is True
-    assert 'toc' in json_response
-    assert 'title' in json_response
-    print(f"English article title: {json_response.get('title', 'N/A')}")
+        json_response = orjson.loads(response.content)
+        assert 'success' in json_response
+        assert json_response['success'] is False
+        assert 'error' in json_response
+        # 実際のエラーメッセージに基づいて調整
+        error_msg = json_response['error'].lower()
+        assert any(keyword in error_msg for keyword in _INV_NS_ERR)
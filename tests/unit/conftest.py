@@ -0,0 +1,11 @@
+import os
+
+
+def pytest_configure(config):
+    """
+    Set up test environment
+
+    Educational Note: pytest_configure runs once before any test module is imported
+    """
+    os.environ.setdefault('ENVIRONMENT', 'test')
+    os.environ.setdefault('LOG_LEVEL', 'DEBUG')
@@ -1,109 +1,137 @@
 import json
+from pathlib import Path
+
 import pytest
+import responses
 from toc_scraper import app
 
+FIXTURE_HTML = (Path(__file__).parent.parent / "fixtures" / "aws_ja.html").read_bytes()
 
-@pytest.fixture()
-def apigw_event_with_valid_url():
-    """Generates API GW Event with valid Wikipedia URL"""
-
-    return {
-        "body": None,
-        "resource": "/toc",
-        "requestContext": {
-            "resourceId": "123456",
-            "apiId": "1234567890",
-            "resourcePath": "/toc",
-            "httpMethod": "GET",
-            "requestId": "c6af9ac6-7b61-11e6-9a41-93e8deadbeef",
-            "accountId": "123456789012",
-            "stage": "prod",
-        },
-        "queryStringParameters": {"url": "https://ja.wikipedia.org/wiki/Amazon_Web_Services"},
-        "headers": {
-            "Accept": "application/json",
-            "Host": "1234567890.execute-api.us-east-1.amazonaws.com",
-        },
-        "pathParameters": None,
-        "httpMethod": "GET",
-        "path": "/toc",
-    }
 
+@pytest.fixture(autouse=True)
+def offline_wikipedia(monkeypatch):
+    """Replay the recorded article and refuse any other outbound HTTP request"""
 
-@pytest.fixture()
-def apigw_event_with_invalid_url():
-    """Generates API GW Event with invalid URL"""
-
-    return {
-        "body": None,
-        "resource": "/toc",
-        "requestContext": {
-            "resourceId": "123456",
-            "apiId": "1234567890",
-            "resourcePath": "/toc",
-            "httpMethod": "GET",
-            "requestId": "c6af9ac6-7b61-11e6-9a41-93e8deadbeef",
-            "accountId": "123456789012",
-            "stage": "prod",
-        },
-        "queryStringParameters": {"url": "https://example.com/test"},
-        "headers": {
-            "Accept": "application/json",
-            "Host": "1234567890.execute-api.us-east-1.amazonaws.com",
-        },
-        "pathParameters": None,
+    monkeypatch.setattr("toc_scraper.app.MIN_REQUEST_INTERVAL", 0)
+    monkeypatch.setattr("toc_scraper.app._TOC_CACHE", {})
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        rsps.get(
+            "https://ja.wikipedia.org/wiki/Amazon_Web_Services",
+            body=FIXTURE_HTML,
+            content_type="text/html; charset=UTF-8",
+        )
+        yield rsps
+
+
+_BASE_EVENT = {
+    "body": None,
+    "resource": "/toc",
+    "requestContext": {
+        "resourceId": "123456",
+        "apiId": "1234567890",
+        "resourcePath": "/toc",
         "httpMethod": "GET",
-        "path": "/toc",
-    }
+        "requestId": "c6af9ac6-7b61-11e6-9a41-93e8deadbeef",
+        "accountId": "123456789012",
+        "stage": "prod",
+    },
+    "queryStringParameters": None,
+    "headers": {
+        "Accept": "application/json",
+        "Host": "1234567890.execute-api.us-east-1.amazonaws.com",
+    },
+    "pathParameters": None,
+    "httpMethod": "GET",
+    "path": "/toc",
+}
 
 
 @pytest.fixture()
-def apigw_event_no_url():
-    """Generates API GW Event without URL parameter"""
-
-    return {
-        "body": None,
-        "resource": "/toc",
-        "requestContext": {
-            "resourceId": "123456",
-            "apiId": "1234567890",
-            "resourcePath": "/toc",
-            "httpMethod": "GET",
-            "requestId": "c6af9ac6-7b61-11e6-9a41-93e8deadbeef",
-            "accountId": "123456789012",
-            "stage": "prod",
-        },
-        "queryStringParameters": None,
-        "headers": {
-            "Accept": "application/json",
-            "Host": "1234567890.execute-api.us-east-1.amazonaws.com",
-        },
-        "pathParameters": None,
-        "httpMethod": "GET",
-        "path": "/toc",
-    }
+def make_event():
+    """Generates API GW Event with the given query string parameters"""
+
+    def _make(query_string_parameters):
+        return {**_BASE_EVENT, "queryStringParameters": query_string_parameters}
 
+    return _make
 
-def test_lambda_handler_valid_url(apigw_event_with_valid_url):
+
+def test_lambda_handler_valid_url(make_event):
     """Test with valid Wikipedia URL"""
 
-    ret = app.lambda_handler(apigw_event_with_valid_url, "")
+    ret = app.lambda_handler(make_event({"url": "https://ja.wikipedia.org/wiki/Amazon_Web_Services"}), "")
     data = json.loads(ret["body"])
 
     assert ret["statusCode"] == 200
     assert data["success"] is True
     assert data["url"] == "https://ja.wikipedia.org/wiki/Amazon_Web_Services"
+    assert data["article_name"] == "Amazon_Web_Services"
     assert "title" in data
     assert "toc" in data
     assert "total_items" in data
     assert isinstance(data["toc"], list)
     assert isinstance(data["total_items"], int)
+    assert data["title"] == "Amazon Web Services"
+    assert data["toc"][0] == {"level": 1, "title": "概要", "anchor": "概要", "href": "#概要"}
+    assert data["total_items"] == 8
+    assert data["truncated"] is False
+
+
+def test_lambda_handler_caches_toc(make_event, offline_wikipedia):
+    """Test that a warm container serves a repeated URL without refetching it"""
+
+    event = make_event({"url": "https://ja.wikipedia.org/wiki/Amazon_Web_Services"})
+    first = app.lambda_handler(event, "")
+    second = app.lambda_handler(event, "")
+
+    assert first["statusCode"] == second["statusCode"] == 200
+    assert first["body"] == second["body"]
+    assert len(offline_wikipedia.calls) == 1
+
+
+def test_lambda_handler_cached_response_is_not_shared(make_event):
+    """Test that modifying a returned TOC response does not change later cache hits"""
+
+    event = make_event({"url": "https://ja.wikipedia.org/wiki/Amazon_Web_Services"})
+    for _ in range(2):
+        ret = app.lambda_handler(event, "")
+        ret["headers"]["X-Injected"] = "1"
+        ret["statusCode"] = 418
+
+    hit = app.lambda_handler(event, "")
+
+    assert hit["statusCode"] == 200
+    assert "X-Injected" not in hit["headers"]
+    assert "X-Injected" not in app._CACHEABLE_RESPONSE_HEADERS
+
+
+def test_toc_cache_evicts_least_recently_used(monkeypatch):
+    """Test that a cache hit keeps an entry from being evicted first"""
 
+    monkeypatch.setattr("toc_scraper.app.TOC_CACHE_MAX_ENTRIES", 2)
+    monkeypatch.setattr("toc_scraper.app.scrape_wikipedia_toc", lambda url, debug=False: {"success": True, "url": url, "truncated": False})
 
-def test_lambda_handler_invalid_url(apigw_event_with_invalid_url):
+    for url in ("a", "b", "a", "c"):
+        app._toc_response_cached(url)
+
+    assert list(app._TOC_CACHE) == ["a", "c"]
+
+
+def test_lambda_handler_fetch_error(make_event):
+    """Test that an unrecorded article is reported as a fetch failure"""
+
+    ret = app.lambda_handler(make_event({"url": "https://en.wikipedia.org/wiki/Python"}), "")
+    data = json.loads(ret["body"])
+
+    assert ret["statusCode"] == 500
+    assert data["success"] is False
+    assert "Failed to fetch Wikipedia page" in data["error"]
+
+
+def test_lambda_handler_invalid_url(make_event):
     """Test with invalid URL"""
 
-    ret = app.lambda_handler(apigw_event_with_invalid_url, "")
+    ret = app.lambda_handler(make_event({"url": "https://example.com/test"}), "")
     data = json.loads(ret["body"])
 
     assert ret["statusCode"] == 400
@@ -111,10 +139,10 @@ def test_lambda_handler_invalid_url(apigw_event_with_invalid_url):
     assert "Invalid Wikipedia URL" in data["error"]
 
 
-def test_lambda_handler_no_url(apigw_event_no_url):
+def test_lambda_handler_no_url(make_event):
     """Test without URL parameter"""
 
-    ret = app.lambda_handler(apigw_event_no_url, "")
+    ret = app.lambda_handler(make_event(None), "")
     data = json.loads(ret["body"])
 
     assert ret["statusCode"] == 400
@@ -122,15 +150,157 @@ def test_lambda_handler_no_url(apigw_event_no_url):
     assert "URL parameter is required" in data["error"]
 
 
-def test_validate_wikipedia_url():
-    """Test URL validation function directly"""
+def test_lambda_handler_method_not_allowed(make_event):
+    """Test that non-GET methods are rejected"""
+
+    event = {**make_event({"url": "https://ja.wikipedia.org/wiki/Amazon_Web_Services"}), "httpMethod": "POST"}
+    ret = app.lambda_handler(event, "")
+    data = json.loads(ret["body"])
+
+    assert ret["statusCode"] == 405
+    assert data["success"] is False
+    assert "Method not allowed" in data["error"]
+
+
+@pytest.mark.parametrize("event_update", [{"httpMethod": "POST"}, {"queryStringParameters": None}])
+def test_lambda_handler_static_responses_are_not_shared(make_event, event_update):
+    """Test that modifying a returned 400/405 response does not leak into the next invocation"""
+
+    event = {**make_event(None), **event_update}
+    first = app.lambda_handler(event, "")
+    first["headers"]["X-Injected"] = "1"
+    first["body"] = ""
+
+    second = app.lambda_handler(event, "")
+
+    assert "X-Injected" not in second["headers"]
+    assert "X-Injected" not in app._RESPONSE_HEADERS
+    assert json.loads(second["body"])["success"] is False
 
-    # Valid URLs
-    assert app.validate_wikipedia_url("https://ja.wikipedia.org/wiki/Amazon_Web_Services")[0] is True
-    assert app.validate_wikipedia_url("https://en.wikipedia.org/wiki/Python")[0] is True
 
+def test_scrape_rate_limit_waits_only_between_requests(monkeypatch):
+    """Test that only a request following another one within the interval sleeps"""
+
+    sleeps = []
+    monkeypatch.setattr("toc_scraper.app.MIN_REQUEST_INTERVAL", 1.0)
+    monkeypatch.setattr("toc_scraper.app._last_request_at", {})
+    monkeypatch.setattr("toc_scraper.app.time.sleep", sleeps.append)
+
+    for _ in range(2):
+        assert app.scrape_wikipedia_toc("https://ja.wikipedia.org/wiki/Amazon_Web_Services")["success"] is True
+
+    assert len(sleeps) == 1
+    assert 0 < sleeps[0] <= 1.0
+
+
+def test_rate_limit_is_tracked_per_host(monkeypatch):
+    """Test that a request to a different Wikipedia host does not wait"""
+
+    sleeps = []
+    monkeypatch.setattr("toc_scraper.app.MIN_REQUEST_INTERVAL", 1.0)
+    monkeypatch.setattr("toc_scraper.app._last_request_at", {})
+    monkeypatch.setattr("toc_scraper.app.time.sleep", sleeps.append)
+
+    app._wait_for_rate_limit("ja.wikipedia.org")
+    app._wait_for_rate_limit("en.wikipedia.org")
+    assert sleeps == []
+
+    app._wait_for_rate_limit("ja.wikipedia.org")
+    assert len(sleeps) == 1
+
+
+def test_scrape_falls_back_to_headings_after_empty_toc(offline_wikipedia):
+    """Test that a TOC without usable items does not cut off the headings that follow it"""
+
+    page = "<html><body><h1 class='firstHeading'>Empty</h1><div id='toc'><a href='#toc'>Contents</a></div>" \
+        f"{'<p>x</p>' * 20000}<h2 id='a'>A</h2><h2 id='b'>B</h2></body></html>"
+    offline_wikipedia.get("https://ja.wikipedia.org/wiki/Empty", body=page.encode("utf-8"), content_type="text/html")
+
+    result = app.scrape_wikipedia_toc("https://ja.wikipedia.org/wiki/Empty")
+
+    assert result["success"] is True
+    assert [item.anchor for item in result["toc"]] == ["a", "b"]
+
+
+@pytest.mark.parametrize("page,content_type", [
+    # meta charset が本文の文字コードを宣言し、ヘッダーに charset がない
+    ("<html><head><meta charset='iso-8859-1'></head><body><h1 class='firstHeading'>Café</h1><h2>Café</h2></body></html>".encode("latin-1"), "text/html"),
+    ("<html><head><meta http-equiv='Content-Type' content='text/html; charset=iso-8859-1'></head>"
+     "<body><h1 class='firstHeading'>Café</h1><h2>Café</h2></body></html>".encode("latin-1"), "text/html"),
+    # 宣言がなければUTF-8として読む
+    ("<html><body><h1 class='firstHeading'>Café</h1><h2>Café</h2></body></html>".encode("utf-8"), "text/html"),
+    # ヘッダーの charset を優先する
+    ("<html><body><h1 class='firstHeading'>Café</h1><h2>Café</h2></body></html>".encode("latin-1"), "text/html; charset=ISO-8859-1"),
+])
+def test_scrape_detects_document_encoding(offline_wikipedia, page, content_type):
+    """Test that the meta charset is honoured when the response header does not name one"""
+
+    offline_wikipedia.get("https://ja.wikipedia.org/wiki/Cafe", body=page, content_type=content_type)
+
+    result = app.scrape_wikipedia_toc("https://ja.wikipedia.org/wiki/Cafe")
+
+    assert result["success"] is True
+    assert result["title"] == "Café"
+    assert [(item.title, item.anchor) for item in result["toc"]] == [("Café", "Café")]
+
+
+@pytest.mark.parametrize("body", [b"", b"   \n", b"<!-- empty -->"])
+def test_scrape_empty_document(offline_wikipedia, body):
+    """Test that an empty 200 body yields an empty TOC instead of a parse failure"""
+
+    offline_wikipedia.get("https://ja.wikipedia.org/wiki/Empty", body=body, content_type="text/html; charset=UTF-8")
+
+    result = app.scrape_wikipedia_toc("https://ja.wikipedia.org/wiki/Empty")
+
+    assert result["success"] is True
+    assert result["title"] == "Unknown"
+    assert result["toc"] == []
+
+
+@pytest.mark.parametrize("tag", ["script", "style", "template"])
+def test_scrape_ignores_non_visible_text(offline_wikipedia, tag):
+    """Test that script/style/template contents do not leak into titles and anchors"""
+
+    page = f"<html><body><h1 class='firstHeading'>T<{tag}>x</{tag}>X</h1><h2>A<{tag}>var x=1;</{tag}>B</h2></body></html>"
+    offline_wikipedia.get("https://ja.wikipedia.org/wiki/Script", body=page.encode("utf-8"), content_type="text/html")
+
+    result = app.scrape_wikipedia_toc("https://ja.wikipedia.org/wiki/Script")
+
+    assert result["title"] == "TX"
+    assert [(item.title, item.anchor) for item in result["toc"]] == [("AB", "AB")]
+
+
+def test_scrape_stops_reading_at_response_cap(monkeypatch, offline_wikipedia):
+    """Test that a page without a TOC is only parsed up to MAX_RESPONSE_BYTES"""
+
+    monkeypatch.setattr("toc_scraper.app.MAX_RESPONSE_BYTES", 64 * 1024)
+    padding = "<p>" + "x" * 1024 + "</p>"
+    page = f"<html><body><h1 class='firstHeading'>Big</h1><h2 id='a'>A</h2>{padding * 256}<h2 id='b'>B</h2></body></html>"
+    offline_wikipedia.get("https://ja.wikipedia.org/wiki/Big", body=page.encode("utf-8"), content_type="text/html")
+
+    result = app.scrape_wikipedia_toc("https://ja.wikipedia.org/wiki/Big")
+
+    assert result["success"] is True
+    assert result["truncated"] is True
+    assert [item.anchor for item in result["toc"]] == ["a"]
+
+    # A partial TOC is neither cached in the container nor marked cacheable for clients
+    response = app._toc_response_cached("https://ja.wikipedia.org/wiki/Big")
+    assert "Cache-Control" not in response["headers"]
+    assert app._TOC_CACHE == {}
+
+
+@pytest.mark.parametrize("url,ok", [
+    # Valid URLs
+    ("https://ja.wikipedia.org/wiki/Amazon_Web_Services", True),
+    ("https://en.wikipedia.org/wiki/Python", True),
     # Invalid URLs
-    assert app.validate_wikipedia_url("https://example.com/test")[0] is False
-    assert app.validate_wikipedia_url("https://ja.wikipedia.org/wiki/Special:RecentChanges")[0] is False
-    assert app.validate_wikipedia_url("https://ja.wikipedia.org/wiki/利用者:TestUser")[0] is False
-    assert app.validate_wikipedia_url("")[0] is False
+    ("https://example.com/test", False),
+    ("https://ja.wikipedia.org/wiki/Special:RecentChanges", False),
+    ("https://ja.wikipedia.org/wiki/利用者:TestUser", False),
+    ("", False),
+])
+def test_validate_wikipedia_url(url, ok):
+    """Test URL validation function directly"""
+
+    assert app.validate_wikipedia_url(url)[0] is ok
@@ -15,13 +15,27 @@ Educational Focus:
 - Explore internationalization testing
 """
 
+import gc
+import re
+import statistics
+from functools import lru_cache
+from time import perf_counter_ns
+
 import pytest
-import time
-from unittest.mock import Mock, patch
-from toc_scraper.app import validate_wikipedia_url, scrape_wikipedia_toc, lambda_handler
+from toc_scraper.app import validate_wikipedia_url, validate_many
 
 
 # Test Helper Functions - Educational Pattern: DRY Principle
+@lru_cache(maxsize=None)
+def _keyword_pattern(keywords):
+    """
+    Compile a case-insensitive alternation of the expected keywords once per keyword tuple
+    
+    Educational Note: One C-level regex search replaces a Python loop of substring scans
+    """
+    return re.compile('|'.join(re.escape(keyword) for keyword in keywords), re.IGNORECASE)
+
+
 def assert_url_rejected(url, expected_keywords=None):
     """
     Helper function to verify URL rejection with optional keyword validation
@@ -35,7 +49,7 @@ def assert_url_rejected(url, expected_keywords=None):
         if isinstance(expected_keywords, str):
             expected_keywords = [expected_keywords]
         
-        keyword_found = any(keyword.lower() in error_msg.lower() for keyword in expected_keywords)
+        keyword_found = _keyword_pattern(tuple(expected_keywords)).search(error_msg) is not None
         assert keyword_found, f"Error message should contain one of {expected_keywords}: {error_msg}"
     
     return error_msg
@@ -51,6 +65,44 @@ def assert_url_accepted(url):
     assert is_valid == True, f"Should accept URL: {url}, Error: {error_msg}"
 
 
+# Test Data - Educational Pattern: module-level tuples shared by parametrized tests
+VALID_MULTILINGUAL_URLS = (
+    "https://de.wikipedia.org/wiki/Künstliche_Intelligenz",
+    "https://es.wikipedia.org/wiki/Inteligencia_artificial",
+    "https://fr.wikipedia.org/wiki/Intelligence_artificielle",
+    "https://zh.wikipedia.org/wiki/人工智能",
+    "https://ru.wikipedia.org/wiki/Искусственный_интеллект",
+)
+
+ENGLISH_FORBIDDEN_NAMESPACE_URLS = (
+    "https://en.wikipedia.org/wiki/Special:RecentChanges",
+    "https://en.wikipedia.org/wiki/User:TestUser",
+    "https://en.wikipedia.org/wiki/User_talk:Example",
+    "https://en.wikipedia.org/wiki/Talk:Example",
+    "https://en.wikipedia.org/wiki/File:Example.jpg",
+    "https://en.wikipedia.org/wiki/Media:Example.ogg",
+    "https://en.wikipedia.org/wiki/Category:Example",
+    "https://en.wikipedia.org/wiki/Template:Infobox",
+    "https://en.wikipedia.org/wiki/Help:Contents",
+    "https://en.wikipedia.org/wiki/Portal:Technology",
+    "https://en.wikipedia.org/wiki/Draft:Example",
+    "https://en.wikipedia.org/wiki/Book:Example",
+    "https://en.wikipedia.org/wiki/Module:Test",
+    "https://en.wikipedia.org/wiki/MediaWiki:Test",
+    "https://en.wikipedia.org/wiki/Project:Test",
+    "https://en.wikipedia.org/wiki/Wikipedia:About",
+)
+
+JAPANESE_FORBIDDEN_NAMESPACE_URLS = (
+    "https://ja.wikipedia.org/wiki/特別:最近の更新",
+    "https://ja.wikipedia.org/wiki/利用者:TestUser",
+    "https://ja.wikipedia.org/wiki/利用者‐会話:TestUser",
+    "https://ja.wikipedia.org/wiki/ノート:テスト",
+    "https://ja.wikipedia.org/wiki/ファイル:Example.jpg",
+    "https://ja.wikipedia.org/wiki/カテゴリ:テスト",
+)
+
+
 class TestValidWikipediaUrls:
     """
     Testing Valid Wikipedia URLs
@@ -70,52 +122,55 @@ class TestValidWikipediaUrls:
         """Test English Wikipedia article URL validation"""
         assert_url_accepted("https://en.wikipedia.org/wiki/Python")
     
-    def test_valid_multilingual_support(self):
+    @pytest.mark.parametrize("url", VALID_MULTILINGUAL_URLS)
+    def test_valid_multilingual_support(self, url):
         """
         Test multi-language Wikipedia support
         
         Educational Note: Web applications often need to handle multiple languages
         """
-        valid_urls = [
-            "https://de.wikipedia.org/wiki/Künstliche_Intelligenz",
-            "https://es.wikipedia.org/wiki/Inteligencia_artificial",
-            "https://fr.wikipedia.org/wiki/Intelligence_artificielle",
-            "https://zh.wikipedia.org/wiki/人工智能",
-            "https://ru.wikipedia.org/wiki/Искусственный_интеллект"
-        ]
-        for url in valid_urls:
-            assert_url_accepted(url)
+        assert_url_accepted(url)
     
-    def test_valid_article_name_patterns(self):
+    def test_validate_many_matches_single_calls(self):
+        """
+        Test the batch validation entry point
+        
+        Educational Note: Batch APIs should return exactly what per-item calls would
+        """
+        urls = VALID_MULTILINGUAL_URLS + ENGLISH_FORBIDDEN_NAMESPACE_URLS
+        results = validate_many(urls)
+        
+        assert results == [validate_wikipedia_url(url) for url in urls]
+        assert [ok for ok, _ in results] == [True] * len(VALID_MULTILINGUAL_URLS) + [False] * len(ENGLISH_FORBIDDEN_NAMESPACE_URLS)
+    
+    @pytest.mark.parametrize("url", [
+        "https://en.wikipedia.org/wiki/Machine_learning",  # アンダースコア
+        "https://en.wikipedia.org/wiki/Python_(programming_language)",  # 括弧
+        "https://en.wikipedia.org/wiki/World_War_II",  # 数字
+        "https://en.wikipedia.org/wiki/AC/DC",  # スラッシュ
+        "https://en.wikipedia.org/wiki/2023",  # 数字開始
+        "https://en.wikipedia.org/wiki/COVID-19",  # ハイフンと数字
+    ])
+    def test_valid_article_name_patterns(self, url):
         """
         Test various article naming patterns
         
         Educational Note: Real-world URLs contain special characters, numbers, and symbols
         """
-        valid_patterns = [
-            "https://en.wikipedia.org/wiki/Machine_learning",  # アンダースコア
-            "https://en.wikipedia.org/wiki/Python_(programming_language)",  # 括弧
-            "https://en.wikipedia.org/wiki/World_War_II",  # 数字
-            "https://en.wikipedia.org/wiki/AC/DC",  # スラッシュ
-            "https://en.wikipedia.org/wiki/2023",  # 数字開始
-            "https://en.wikipedia.org/wiki/COVID-19"  # ハイフンと数字
-        ]
-        for url in valid_patterns:
-            assert_url_accepted(url)
+        assert_url_accepted(url)
     
-    def test_valid_url_with_query_and_fragment(self):
+    @pytest.mark.parametrize("url", [
+        "https://en.wikipedia.org/wiki/Test?action=edit",
+        "https://en.wikipedia.org/wiki/Test#section",
+        "https://en.wikipedia.org/wiki/Test?oldid=123456#history",
+    ])
+    def test_valid_url_with_query_and_fragment(self, url):
         """
         Test URLs with query parameters and fragments
         
         Educational Note: URLs often contain additional parameters that should be handled gracefully
         """
-        urls_with_extras = [
-            "https://en.wikipedia.org/wiki/Test?action=edit",
-            "https://en.wikipedia.org/wiki/Test#section",
-            "https://en.wikipedia.org/wiki/Test?oldid=123456#history"
-        ]
-        for url in urls_with_extras:
-            assert_url_accepted(url)
+        assert_url_accepted(url)
 
 
 class TestRobotsTxtCompliance:
@@ -130,53 +185,48 @@ class TestRobotsTxtCompliance:
     Why This Matters: Proper robots.txt compliance prevents legal issues and maintains good relationships with website owners
     """
     
-    def test_forbidden_system_paths(self):
+    @pytest.mark.parametrize("url,path_type", [
+        ("https://en.wikipedia.org/w/index.php?title=Test", "/w/"),  # /w/
+        ("https://en.wikipedia.org/api/rest_v1/page/summary/Test", "/api/"),  # /api/
+        ("https://en.wikipedia.org/trap/test", "/trap/"),  # /trap/
+    ])
+    def test_forbidden_system_paths(self, url, path_type):
         """
         Test rejection of system-level paths
         
         Educational Note: System paths like /w/ and /api/ are typically reserved for internal use
         """
-        forbidden_paths = [
-            ("https://en.wikipedia.org/w/index.php?title=Test", "/w/"),  # /w/
-            ("https://en.wikipedia.org/api/rest_v1/page/summary/Test", "/api/"),  # /api/
-            ("https://en.wikipedia.org/trap/test", "/trap/")  # /trap/
-        ]
-        for url, path_type in forbidden_paths:
-            is_valid, error_msg = validate_wikipedia_url(url)
-            assert is_valid == False, f"Should reject system path: {url}"
-            # app.pyの実際のエラーメッセージに合わせて検証
-            assert ("robots.txt" in error_msg.lower() or 
-                    "prohibited" in error_msg.lower() or
-                    "article" in error_msg.lower()), f"Error message should indicate forbidden path: {error_msg}"
-    
-    def test_protocol_and_domain_validation(self):
+        is_valid, error_msg = validate_wikipedia_url(url)
+        assert is_valid == False, f"Should reject system path: {url}"
+        # app.pyの実際のエラーメッセージに合わせて検証
+        assert _keyword_pattern(("robots.txt", "prohibited", "article")).search(error_msg), f"Error message should indicate forbidden path: {error_msg}"
+    
+    @pytest.mark.parametrize("url,expected_keywords", [
+        ("http://en.wikipedia.org/wiki/Test", ["HTTPS"]),  # HTTP禁止
+        ("https://example.com/wiki/Test", ["Wikipedia"]),  # 非Wikipediaドメイン
+        ("https://m.wikipedia.org/wiki/Test", ["Mobile", "supported"]),  # モバイル版
+        ("https://commons.wikipedia.org/wiki/Test", ["Commons", "supported"]),  # Commons
+    ])
+    def test_protocol_and_domain_validation(self, url, expected_keywords):
         """
         Test strict protocol and domain validation
         
         Educational Note: Security best practices require HTTPS and domain verification
         """
-        invalid_urls = [
-            ("http://en.wikipedia.org/wiki/Test", ["HTTPS"]),  # HTTP禁止
-            ("https://example.com/wiki/Test", ["Wikipedia"]),  # 非Wikipediaドメイン
-            ("https://m.wikipedia.org/wiki/Test", ["Mobile", "supported"]),  # モバイル版
-            ("https://commons.wikipedia.org/wiki/Test", ["Commons", "supported"])  # Commons
-        ]
-        for url, expected_keywords in invalid_urls:
-            assert_url_rejected(url, expected_keywords)
+        assert_url_rejected(url, expected_keywords)
     
-    def test_path_structure_validation(self):
+    @pytest.mark.parametrize("url,expected_keywords", [
+        ("https://en.wikipedia.org/", ["article", "required"]),  # パスなし
+        ("https://en.wikipedia.org/wiki/", ["article", "required"]),  # 記事名なし
+        ("https://en.wikipedia.org/index.php", ["article", "/wiki/"]),  # 非/wiki/パス
+    ])
+    def test_path_structure_validation(self, url, expected_keywords):
         """
         Test Wikipedia-specific path structure requirements
         
         Educational Note: Different websites have different URL patterns
         """
-        invalid_paths = [
-            ("https://en.wikipedia.org/", ["article", "required"]),  # パスなし
-            ("https://en.wikipedia.org/wiki/", ["article", "required"]),  # 記事名なし
-            ("https://en.wikipedia.org/index.php", ["article", "/wiki/"])  # 非/wiki/パス
-        ]
-        for url, expected_keywords in invalid_paths:
-            assert_url_rejected(url, expected_keywords)
+        assert_url_rejected(url, expected_keywords)
 
 
 class TestForbiddenNamespaces:
@@ -191,68 +241,40 @@ class TestForbiddenNamespaces:
     Key Concept: Namespaces separate different types of content (articles, user pages, discussions, etc.)
     """
     
-    def test_english_forbidden_namespaces(self):
+    @pytest.mark.parametrize("url", ENGLISH_FORBIDDEN_NAMESPACE_URLS)
+    def test_english_forbidden_namespaces(self, url):
         """
         Test English namespace prohibition
         
         Educational Note: Each namespace serves a specific purpose and may not be suitable for scraping
         """
-        forbidden_namespaces = [
-            "https://en.wikipedia.org/wiki/Special:RecentChanges",
-            "https://en.wikipedia.org/wiki/User:TestUser",
-            "https://en.wikipedia.org/wiki/User_talk:Example",
-            "https://en.wikipedia.org/wiki/Talk:Example",
-            "https://en.wikipedia.org/wiki/File:Example.jpg",
-            "https://en.wikipedia.org/wiki/Media:Example.ogg",
-            "https://en.wikipedia.org/wiki/Category:Example",
-            "https://en.wikipedia.org/wiki/Template:Infobox",
-            "https://en.wikipedia.org/wiki/Help:Contents",
-            "https://en.wikipedia.org/wiki/Portal:Technology",
-            "https://en.wikipedia.org/wiki/Draft:Example",
-            "https://en.wikipedia.org/wiki/Book:Example",
-            "https://en.wikipedia.org/wiki/Module:Test",
-            "https://en.wikipedia.org/wiki/MediaWiki:Test",
-            "https://en.wikipedia.org/wiki/Project:Test",
-            "https://en.wikipedia.org/wiki/Wikipedia:About"
-        ]
-        for url in forbidden_namespaces:
-            is_valid, error_msg = validate_wikipedia_url(url)
-            assert is_valid == False, f"Should reject forbidden namespace: {url}"
-            assert ("robots.txt" in error_msg.lower() or 
-                    "prohibited" in error_msg.lower()), f"Error should mention prohibition: {error_msg}"
-    
-    def test_japanese_forbidden_namespaces(self):
+        is_valid, error_msg = validate_wikipedia_url(url)
+        assert is_valid == False, f"Should reject forbidden namespace: {url}"
+        assert _keyword_pattern(("robots.txt", "prohibited")).search(error_msg), f"Error should mention prohibition: {error_msg}"
+    
+    @pytest.mark.parametrize("url", JAPANESE_FORBIDDEN_NAMESPACE_URLS)
+    def test_japanese_forbidden_namespaces(self, url):
         """
         Test Japanese namespace prohibition
         
         Educational Note: Namespace names are localized in different language versions of Wikipedia
         """
-        japanese_forbidden = [
-            "https://ja.wikipedia.org/wiki/特別:最近の更新",
-            "https://ja.wikipedia.org/wiki/利用者:TestUser",
-            "https://ja.wikipedia.org/wiki/利用者‐会話:TestUser",
-            "https://ja.wikipedia.org/wiki/ノート:テスト",
-            "https://ja.wikipedia.org/wiki/ファイル:Example.jpg",
-            "https://ja.wikipedia.org/wiki/カテゴリ:テスト"
-        ]
-        for url in japanese_forbidden:
-            assert validate_wikipedia_url(url)[0] == False, f"Should reject Japanese forbidden namespace: {url}"
+        assert validate_wikipedia_url(url)[0] == False, f"Should reject Japanese forbidden namespace: {url}"
     
-    def test_case_insensitive_validation(self):
+    @pytest.mark.parametrize("url", [
+        "https://en.wikipedia.org/wiki/SPECIAL:RecentChanges",
+        "https://en.wikipedia.org/wiki/special:RecentChanges",
+        "https://en.wikipedia.org/wiki/Special:RECENTCHANGES",
+        "https://en.wikipedia.org/wiki/USER:TestUser",
+        "https://en.wikipedia.org/wiki/user:testuser",
+    ])
+    def test_case_insensitive_validation(self, url):
         """
         Test case-insensitive namespace detection
         
         Educational Note: URLs can have various capitalizations, so robust validation is needed
         """
-        case_variations = [
-            "https://en.wikipedia.org/wiki/SPECIAL:RecentChanges",
-            "https://en.wikipedia.org/wiki/special:RecentChanges",
-            "https://en.wikipedia.org/wiki/Special:RECENTCHANGES",
-            "https://en.wikipedia.org/wiki/USER:TestUser",
-            "https://en.wikipedia.org/wiki/user:testuser"
-        ]
-        for url in case_variations:
-            assert validate_wikipedia_url(url)[0] == False, f"Should reject case variation: {url}"
+        assert validate_wikipedia_url(url)[0] == False, f"Should reject case variation: {url}"
 
 
 class TestUrlEncodingSupport:
@@ -267,47 +289,44 @@ class TestUrlEncodingSupport:
     Key Concept: URLs must encode special characters to be transmitted safely over the internet
     """
     
-    def test_encoded_japanese_articles(self):
+    @pytest.mark.parametrize("url", [
+        "https://ja.wikipedia.org/wiki/%E4%BA%BA%E5%B7%A5%E7%9F%A5%E8%83%BD",  # 人工知能
+        "https://ja.wikipedia.org/wiki/Amazon%20Web%20Services",  # スペース
+        "https://ja.wikipedia.org/wiki/C%2B%2B",  # C++
+    ])
+    def test_encoded_japanese_articles(self, url):
         """
         Test handling of URL-encoded Japanese characters
         
         Educational Note: Non-ASCII characters are encoded as percent sequences (e.g., %E4%BA%BA)
         """
-        encoded_articles = [
-            "https://ja.wikipedia.org/wiki/%E4%BA%BA%E5%B7%A5%E7%9F%A5%E8%83%BD",  # 人工知能
-            "https://ja.wikipedia.org/wiki/Amazon%20Web%20Services",  # スペース
-            "https://ja.wikipedia.org/wiki/C%2B%2B"  # C++
-        ]
-        for url in encoded_articles:
-            assert validate_wikipedia_url(url)[0] == True, f"Should accept encoded article: {url}"
+        assert validate_wikipedia_url(url)[0] == True, f"Should accept encoded article: {url}"
     
-    def test_encoded_forbidden_namespaces(self):
+    @pytest.mark.parametrize("url", [
+        "https://ja.wikipedia.org/wiki/%E5%88%A9%E7%94%A8%E8%80%85:TestUser",  # 利用者
+        "https://ja.wikipedia.org/wiki/%E7%89%B9%E5%88%A5:RecentChanges",  # 特別
+        "https://en.wikipedia.org/wiki/User%3ATestUser",  # User:
+    ])
+    def test_encoded_forbidden_namespaces(self, url):
         """
         Test detection of encoded forbidden namespaces
         
         Educational Note: Security validation must work even when input is encoded
         """
-        encoded_forbidden = [
-            "https://ja.wikipedia.org/wiki/%E5%88%A9%E7%94%A8%E8%80%85:TestUser",  # 利用者
-            "https://ja.wikipedia.org/wiki/%E7%89%B9%E5%88%A5:RecentChanges",  # 特別
-            "https://en.wikipedia.org/wiki/User%3ATestUser"  # User:
-        ]
-        for url in encoded_forbidden:
-            assert validate_wikipedia_url(url)[0] == False, f"Should reject encoded forbidden: {url}"
+        assert validate_wikipedia_url(url)[0] == False, f"Should reject encoded forbidden: {url}"
     
-    def test_special_character_handling(self):
+    @pytest.mark.parametrize("url", [
+        "https://en.wikipedia.org/wiki/AT%26T",  # &
+        "https://en.wikipedia.org/wiki/C%23_%28programming_language%29",  # C#
+        "https://fr.wikipedia.org/wiki/Caf%C3%A9",  # Café
+    ])
+    def test_special_character_handling(self, url):
         """
         Test handling of special characters in article names
         
         Educational Note: Real-world data contains various special characters that need proper handling
         """
-        special_chars = [
-            "https://en.wikipedia.org/wiki/AT%26T",  # &
-            "https://en.wikipedia.org/wiki/C%23_%28programming_language%29",  # C#
-            "https://fr.wikipedia.org/wiki/Caf%C3%A9"  # Café
-        ]
-        for url in special_chars:
-            assert validate_wikipedia_url(url)[0] == True, f"Should handle special chars: {url}"
+        assert validate_wikipedia_url(url)[0] == True, f"Should handle special chars: {url}"
 
 
 class TestInputValidation:
@@ -322,34 +341,81 @@ class TestInputValidation:
     Security Principle: Never trust user input - always validate and sanitize
     """
     
-    def test_null_and_empty_inputs(self):
+    @pytest.mark.parametrize("invalid_input", [None, "", "   ", "\t\n"])
+    def test_null_and_empty_inputs(self, invalid_input):
         """
         Test handling of null and empty inputs
         
         Educational Note: Edge cases like null/empty values often cause application crashes
         """
-        invalid_inputs = [None, "", "   ", "\t\n"]
-        for invalid_input in invalid_inputs:
-            is_valid, error_msg = validate_wikipedia_url(invalid_input)
-            assert is_valid == False, f"Should reject invalid input: {repr(invalid_input)}"
-            assert "required" in error_msg.lower(), f"Error should mention requirement: {error_msg}"
+        is_valid, error_msg = validate_wikipedia_url(invalid_input)
+        assert is_valid == False, f"Should reject invalid input: {repr(invalid_input)}"
+        assert "required" in error_msg.lower(), f"Error should mention requirement: {error_msg}"
     
-    def test_malformed_urls(self):
+    @pytest.mark.parametrize("url", [
+        "not_a_url",
+        "https://",
+        "wikipedia.org/wiki/Test",
+        "https:/en.wikipedia.org/wiki/Test",  # スラッシュ不足
+        "https://en.wikipedia.org//wiki/Test",  # スラッシュ重複
+    ])
+    def test_malformed_urls(self, url):
         """
         Test handling of malformed URLs
         
         Educational Note: Invalid input should be rejected gracefully with helpful error messages
         """
-        malformed_urls = [
-            "not_a_url",
-            "https://",
-            "wikipedia.org/wiki/Test",
-            "https:/en.wikipedia.org/wiki/Test",  # スラッシュ不足
-            "https://en.wikipedia.org//wiki/Test"  # スラッシュ重複
-        ]
-        for url in malformed_urls:
-            assert validate_wikipedia_url(url)[0] == False, f"Should reject malformed URL: {url}"
+        assert validate_wikipedia_url(url)[0] == False, f"Should reject malformed URL: {url}"
     
+    @pytest.mark.parametrize("url", [
+        "https://ja.wikipedia.org/wiki/Spe\ncial:X",
+        "https://ja.wikipedia.org/wiki/Spe\tcial:X",
+        "https://ja.wikipedia.org/wiki/\nSpecial:X",
+        "https://ja.wikipedia.org/wiki/Spe\r\ncial:X",
+    ])
+    def test_tab_and_newline_cannot_bypass_namespace_check(self, url):
+        """
+        Test that tab/CR/LF inside the URL are removed before the namespace check
+
+        Security Note: urlsplit silently drops these characters, so "Spe\ncial:" reaches Wikipedia as "Special:"
+        """
+        is_valid, error_msg = validate_wikipedia_url(url)
+        assert is_valid == False, f"Should reject namespace hidden by control characters: {repr(url)}"
+        assert "special" in error_msg.lower(), f"Error should name the Special namespace: {error_msg}"
+
+    @pytest.mark.parametrize("url", [
+        "https://ja.wikipedia.org/wiki/Special\x00:X",
+        "https://ja.wikipedia.org/wiki/Foo\x1fBar",
+        "https://ja.wikipedia.org/wiki/Foo\x7f",
+        "https://[ja.wikipedia.org/wiki/X",
+        "https://ja.wikipedia.org]/wiki/X",
+        "https://[::1].wikipedia.org/wiki/X",
+    ])
+    def test_control_characters_and_brackets_are_invalid_format(self, url):
+        """
+        Test that other control characters and bracketed hosts are rejected as malformed
+        """
+        assert validate_wikipedia_url(url) == (False, "Invalid URL format"), f"Should reject malformed URL: {repr(url)}"
+
+    @pytest.mark.parametrize("url,expected", [
+        ("https://ja.wikipedia.org/wiki/Foo;bar", (True, "")),
+        ("https://ja.wikipedia.org/wiki/;bar", (False, "Article name is required")),
+        ("https://ja.wikipedia.org/wiki;x/Foo", (False, "URL must be a Wikipedia article (/wiki/article_name)")),
+    ])
+    def test_path_params_are_ignored_like_urlparse(self, url, expected):
+        """
+        Test that ";params" on the last path segment is dropped before validation, as urlparse does
+        """
+        assert validate_wikipedia_url(url) == expected
+
+    def test_special_with_path_params_is_rejected(self):
+        """
+        Test that path params do not hide a forbidden namespace
+        """
+        is_valid, error_msg = validate_wikipedia_url("https://ja.wikipedia.org/wiki/Special:X;y")
+        assert is_valid == False
+        assert "special" in error_msg.lower()
+
     def test_extremely_long_inputs(self):
         """
         Test handling of extremely long inputs
@@ -364,6 +430,15 @@ class TestInputValidation:
         # 実装によって受け入れるか拒否するかは異なるが、クラッシュしないことが重要
         assert isinstance(is_valid, bool)
         assert isinstance(error_msg, str)
+    
+    def test_url_length_limit(self):
+        """
+        Test rejection of inputs beyond the maximum URL length
+        
+        Educational Note: Bounding input size caps the work done per request
+        """
+        long_title = "A" * 5000
+        assert_url_rejected(f"https://en.wikipedia.org/wiki/{long_title}", "too long")
 
 
 class TestErrorHandling:
@@ -378,28 +453,26 @@ class TestErrorHandling:
     UX Principle: Good error messages help users understand and fix problems
     """
     
-    def test_error_message_content(self):
+    @pytest.mark.parametrize("url,expected_keywords", [
+        ("https://example.com/wiki/Test", "Wikipedia"),
+        ("https://en.wikipedia.org/wiki/Special:Test", ["Special", "robots.txt", "prohibited"]),
+        ("https://en.wikipedia.org/wiki/User:Test", ["User", "robots.txt", "prohibited"]),
+        ("http://en.wikipedia.org/wiki/Test", "HTTPS"),
+    ])
+    def test_error_message_content(self, url, expected_keywords):
         """
         Test that error messages contain relevant information
         
         Educational Note: Error messages should be specific enough to help users fix the problem
         """
-        test_cases = [
-            ("https://example.com/wiki/Test", "Wikipedia"),
-            ("https://en.wikipedia.org/wiki/Special:Test", ["Special", "robots.txt", "prohibited"]),
-            ("https://en.wikipedia.org/wiki/User:Test", ["User", "robots.txt", "prohibited"]),
-            ("http://en.wikipedia.org/wiki/Test", "HTTPS")
-        ]
+        is_valid, error_msg = validate_wikipedia_url(url)
+        assert is_valid == False
         
-        for url, expected_keywords in test_cases:
-            is_valid, error_msg = validate_wikipedia_url(url)
-            assert is_valid == False
-            
-            if isinstance(expected_keywords, str):
-                expected_keywords = [expected_keywords]
-            
-            keyword_found = any(keyword.lower() in error_msg.lower() for keyword in expected_keywords)
-            assert keyword_found, f"Error message should contain one of {expected_keywords}: {error_msg}"
+        if isinstance(expected_keywords, str):
+            expected_keywords = [expected_keywords]
+        
+        keyword_found = _keyword_pattern(tuple(expected_keywords)).search(error_msg) is not None
+        assert keyword_found, f"Error message should contain one of {expected_keywords}: {error_msg}"
     
     def test_error_message_structure(self):
         """
@@ -435,42 +508,15 @@ def test_error_message_for_special_page():
     """Test specific error message for Special pages"""
     is_valid, error_msg = validate_wikipedia_url("https://en.wikipedia.org/wiki/Special:RecentChanges")
     assert is_valid == False
-    assert any(keyword in error_msg.lower() for keyword in ['special', 'robots.txt', 'prohibited'])
+    assert _keyword_pattern(('special', 'robots.txt', 'prohibited')).search(error_msg)
 
 def test_error_message_for_user_page():
     """Test specific error message for User pages"""
     is_valid, error_msg = validate_wikipedia_url("https://en.wikipedia.org/wiki/User:TestUser")
     assert is_valid == False
-    assert any(keyword in error_msg.lower() for keyword in ['user', 'robots.txt', 'prohibited'])
+    assert _keyword_pattern(('user', 'robots.txt', 'prohibited')).search(error_msg)
 
 # Tests for various invalid scenarios
-def test_invalid_api_path():
-    assert validate_wikipedia_url("https://en.wikipedia.org/api/rest_v1/page/summary/Test")[0] == False
-
-def test_invalid_book_page():
-    assert validate_wikipedia_url("https://en.wikipedia.org/wiki/Book:Example")[0] == False
-
-def test_invalid_category_page():
-    assert validate_wikipedia_url("https://en.wikipedia.org/wiki/Category:Example")[0] == False
-
-def test_invalid_commons_subdomain():
-    assert validate_wikipedia_url("https://commons.wikipedia.org/wiki/Test")[0] == False
-
-def test_invalid_draft_page():
-    assert validate_wikipedia_url("https://en.wikipedia.org/wiki/Draft:Example")[0] == False
-
-def test_invalid_empty_string():
-    assert validate_wikipedia_url("")[0] == False
-
-def test_invalid_encoded_japanese_user():
-    assert validate_wikipedia_url("https://ja.wikipedia.org/wiki/%E5%88%A9%E7%94%A8%E8%80%85:TestUser")[0] == False
-
-def test_invalid_encoded_special():
-    assert validate_wikipedia_url("https://ja.wikipedia.org/wiki/%E7%89%B9%E5%88%A5:RecentChanges")[0] == False
-
-def test_invalid_file_page():
-    assert validate_wikipedia_url("https://en.wikipedia.org/wiki/File:Example.jpg")[0] == False
-
 def test_invalid_fragment():
     """Test that fragments don't affect validation"""
     assert validate_wikipedia_url("https://example.com/wiki/Test#section")[0] == False
@@ -489,7 +535,7 @@ def test_invalid_german_special():
         assert "/wiki/" in url
     else:
         # If it's rejected, it should have an appropriate error message
-        assert any(keyword in error_msg.lower() for keyword in ['special', 'spezial', 'robots.txt', 'prohibited'])
+        assert _keyword_pattern(('special', 'spezial', 'robots.txt', 'prohibited')).search(error_msg)
 
 def test_invalid_lta_shortcut():
     """Test LTA (Long Term Abuse) shortcut - may be accepted as regular article"""
@@ -505,7 +551,7 @@ def test_invalid_lta_shortcut():
         assert "/wiki/" in url
     else:
         # If rejected, should have appropriate error message
-        assert any(keyword in error_msg.lower() for keyword in ['lta', 'shortcut', 'robots.txt', 'prohibited'])
+        assert _keyword_pattern(('lta', 'shortcut', 'robots.txt', 'prohibited')).search(error_msg)
 
 def test_invalid_wikipedia_shortcut():
     """Test Wikipedia namespace shortcut - may be accepted as regular article"""
@@ -521,85 +567,36 @@ def test_invalid_wikipedia_shortcut():
         assert "/wiki/" in url
     else:
         # If rejected, should have appropriate error message
-        assert any(keyword in error_msg.lower() for keyword in ['wp:', 'wikipedia:', 'shortcut', 'robots.txt', 'prohibited'])
+        assert _keyword_pattern(('wp:', 'wikipedia:', 'shortcut', 'robots.txt', 'prohibited')).search(error_msg)
 
 # Valid test cases
 def test_performance_validation():
-    """Test that validation is reasonably fast"""
-    import time
-    start = time.time()
-    for _ in range(100):
-        validate_wikipedia_url("https://en.wikipedia.org/wiki/Test")
-    end = time.time()
-    assert (end - start) < 1.0  # Should complete in under 1 second
-
-def test_valid_article_starting_with_number():
-    assert validate_wikipedia_url("https://en.wikipedia.org/wiki/2023")[0] == True
+    """Test that validation is reasonably fast (median per-call budget)"""
+    # Bind globals to locals so the timed loop measures the validator, not name lookups
+    validate, clock = validate_wikipedia_url, perf_counter_ns
+    url = "https://en.wikipedia.org/wiki/Test"
+    for _ in range(50):  # warm up caches before measuring
+        validate(url)
+    
+    samples = []
+    record = samples.append
+    gc.disable()  # keep collector pauses out of the samples
+    try:
+        for _ in range(1000):
+            start = clock()
+            validate(url)
+            record(clock() - start)
+    finally:
+        gc.enable()
+    assert statistics.median(samples) < 200_000  # 200 µs per call
 
 def test_valid_article_with_colon_but_not_namespace():
     assert validate_wikipedia_url("https://en.wikipedia.org/wiki/Time:_The_Story")[0] == True
 
-def test_valid_article_with_numbers():
-    assert validate_wikipedia_url("https://en.wikipedia.org/wiki/World_War_II")[0] == True
-
-def test_valid_article_with_parentheses():
-    assert validate_wikipedia_url("https://en.wikipedia.org/wiki/Python_(programming_language)")[0] == True
-
-def test_valid_article_with_slash():
-    assert validate_wikipedia_url("https://en.wikipedia.org/wiki/AC/DC")[0] == True
-
-def test_valid_article_with_underscores():
-    assert validate_wikipedia_url("https://en.wikipedia.org/wiki/Machine_learning")[0] == True
-
-def test_valid_encoded_japanese_article():
-    assert validate_wikipedia_url("https://ja.wikipedia.org/wiki/%E4%BA%BA%E5%B7%A5%E7%9F%A5%E8%83%BD")[0] == True
-
-def test_valid_encoded_spaces():
-    assert validate_wikipedia_url("https://ja.wikipedia.org/wiki/Amazon%20Web%20Services")[0] == True
-
-def test_valid_encoded_special_characters():
-    assert validate_wikipedia_url("https://en.wikipedia.org/wiki/AT%26T")[0] == True
-
-def test_valid_english_wikipedia():
-    assert validate_wikipedia_url("https://en.wikipedia.org/wiki/Python")[0] == True
-
-def test_valid_fragment():
-    assert validate_wikipedia_url("https://en.wikipedia.org/wiki/Test#section")[0] == True
-
-def test_valid_french_wikipedia():
-    assert validate_wikipedia_url("https://fr.wikipedia.org/wiki/Intelligence_artificielle")[0] == True
-
-def test_valid_german_wikipedia():
-    assert validate_wikipedia_url("https://de.wikipedia.org/wiki/Künstliche_Intelligenz")[0] == True
-
-def test_valid_japanese_wikipedia():
-    assert validate_wikipedia_url("https://ja.wikipedia.org/wiki/Amazon_Web_Services")[0] == True
-
-def test_valid_query_parameters():
-    assert validate_wikipedia_url("https://en.wikipedia.org/wiki/Test?action=edit")[0] == True
-
-def test_valid_spanish_wikipedia():
-    assert validate_wikipedia_url("https://es.wikipedia.org/wiki/Inteligencia_artificial")[0] == True
-
 def test_valid_url():
     assert validate_wikipedia_url("https://en.wikipedia.org/wiki/Test")[0] == True
 
 
-# テスト実行時の設定
-@pytest.fixture(scope="session", autouse=True)
-def test_environment_setup():
-    """
-    Set up test environment
-    
-    Educational Note: Fixtures help set up consistent test environments
-    """
-    import os
-    os.environ['ENVIRONMENT'] = 'test'
-    os.environ['LOG_LEVEL'] = 'DEBUG'
-    yield
-    # teardown処理があればここに記述
-
-
 # Test Organization and Categorization
 # Educational Note: Test markers help organize and run specific test categories
 # Example usage: pytest -m "unit" or pytest -m "robots_compliance"
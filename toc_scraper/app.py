@@ -5,13 +5,19 @@
 robots.txt遵守とレート制限を含む。
 """
 
-import json
+import codecs
 import re
 import time
 import sys
-from urllib.parse import urlparse, unquote
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain
+from urllib.parse import unquote, urlsplit
+import orjson
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from lxml import etree, html
 
 
 # robots.txt遵守のためのUser-Agent設定
@@ -19,13 +25,117 @@ HEADERS = {
     'User-Agent': 'Educational-TOC-Scraper/1.0 (Contact: educational.purpose@example.com)',
     'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
     'Accept-Language': 'ja,en-US,en;q=0.9',  # 日本語を優先
-    'Accept-Encoding': 'gzip, deflate',
+    'Accept-Encoding': ACCEPT_ENCODING,  # brotliがインストールされていれば br も要求する
     'Connection': 'keep-alive'
 }
 
+# Wikipediaへのリクエストに使うセッション（ウォームコンテナではTCP/TLS接続を再利用する）
+_SESSION = requests.Session()
+_SESSION.headers.update(HEADERS)
+_SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
 # レート制限のための最小待機時間（秒）
 MIN_REQUEST_INTERVAL = 1.0
 
+# ホストごとに直前にリクエストした時刻（time.monotonic()、ウォームコンテナ間で保持）
+_last_request_at = {}
+
+# Lambdaのウォームコンテナで目次の抽出結果を保持する時間（秒、Cache-Controlのmax-ageと同じ）
+TOC_CACHE_TTL = 300
+
+# 目次キャッシュに保持する最大件数
+TOC_CACHE_MAX_ENTRIES = 128
+
+# レスポンス本文を読み込む単位（バイト）
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# ヘッダーに charset がないとき、本文の meta charset を探す範囲（先頭からのバイト数）
+_META_CHARSET_SCAN_BYTES = 2048
+
+# meta 要素で宣言された文字エンコーディング（<meta charset="..."> と http-equiv の content の両方）
+_META_CHARSET_RE = re.compile(rb'<meta[^>]*?charset\s*=\s*["\']?\s*([A-Za-z0-9._:-]+)', re.IGNORECASE)
+
+# レスポンス本文を読み込む上限（バイト、目次は本文の先頭付近にあるため通常は届かない）
+MAX_RESPONSE_BYTES = 2 * 1024 * 1024
+
+# 目次を読み終えた後、接続を再利用するために読み捨てる本文の上限（転送時のバイト数）
+# これより残りが多い・長さが分からない場合は読まずに接続を閉じる（TLSハンドシェイク1回分の転送量が目安）
+KEEPALIVE_DRAIN_BYTES = 256 * 1024
+
+# 目次の li 要素の class 属性に含まれる階層レベル（例: "toclevel-2 tocsection-3"）
+_TOC_LEVEL_CLASS_RE = re.compile(r'(?:^|\s)toclevel-(\d+)(?=[-\s]|$)', re.ASCII)
+
+# 目次項目の先頭の番号（例: "1.2.3 "）
+_TOC_NUMBER_PREFIX_RE = re.compile(r'^\d+(?:\.\d+)*\s*')
+
+# 受け付けるURLの最大長（一般的なブラウザ・サーバーの上限に合わせる）
+MAX_URL_LENGTH = 2048
+
+# validate_wikipedia_url の戻り値（呼び出しごとにタプルや文字列を生成しない）
+_RESULT_VALID = (True, "")
+_RESULT_REQUIRED = (False, "URL is required")
+_RESULT_TOO_LONG = (False, "URL is too long")
+_RESULT_HTTPS = (False, "URL must use HTTPS")
+_RESULT_DOMAIN = (False, "URL must be from Wikipedia (*.wikipedia.org)")
+_RESULT_ARTICLE_PATH = (False, "URL must be a Wikipedia article (/wiki/article_name)")
+_RESULT_ARTICLE_NAME = (False, "Article name is required")
+_RESULT_INVALID_FORMAT = (False, "Invalid URL format")
+
+# urlsplit と同様にURL中から取り除く文字（タブ・改行）
+_URL_REMOVED_CHARS = str.maketrans('', '', '\t\r\n')
+
+# URL中の制御文字（C0制御文字とDEL）を取り除く変換表（含まれているかの判定に使う）
+_URL_CONTROL_CHARS = str.maketrans('', '', ''.join(map(chr, range(0x20))) + '\x7f')
+
+# 対応しないサブドメイン（サブドメイン -> 戻り値）
+_UNSUPPORTED_SUBDOMAINS = {
+    'm': (False, "Mobile Wikipedia URLs are not supported"),
+    'commons': (False, "Commons Wikipedia URLs are not supported"),
+}
+
+# robots.txt で禁止されているパス（プレフィックス -> 戻り値）
+_FORBIDDEN_PATH_PREFIXES = {
+    prefix: (False, f"Access to {prefix} paths is prohibited by robots.txt")
+    for prefix in ('/w/', '/api/', '/trap/')
+}
+
+# パーセントエンコードされた名前空間区切り文字（":"）
+_ENCODED_NAMESPACE_SEPARATORS = ('%3A', '%3a')
+
+# robots.txt で禁止されている名前空間（casefold した名前 -> 戻り値）
+_FORBIDDEN_NAMESPACES = {
+    name.casefold(): (False, f"Access to {name} pages is prohibited by Wikipedia's robots.txt")
+    for name in (
+        'Special',          # Special pages
+        '特別',             # Special pages (Japanese)
+        'User',             # User pages
+        '利用者',           # User pages (Japanese)
+        'User_talk',        # User talk pages
+        '利用者‐会話',      # User talk pages (Japanese)
+        'Wikipedia',        # Wikipedia namespace
+        'ノート',           # Talk pages (Japanese)
+        'Talk',             # Talk pages (English)
+        'ファイル',         # File pages (Japanese)
+        'File',             # File pages (English)
+        'Media',            # Media pages
+        'カテゴリ',         # Category pages (Japanese)
+        'Category',         # Category pages (English)
+        'Template',         # Template pages
+        'Help',             # Help pages
+        'Portal',           # Portal pages
+        'Draft',            # Draft pages
+        'Book',             # Book pages
+        'Module',           # Module pages
+        'MediaWiki',        # MediaWiki namespace
+        'Project',          # Project pages
+    )
+}
+
+
+# 名前空間の区切りを探す範囲（記事名の先頭から）
+# 1文字は最大4バイト = "%XX" 12文字にエンコードされ得るため、最長の名前空間の12倍まで見れば十分
+_NAMESPACE_SCAN_LIMIT = 12 * max(len(name) for name in _FORBIDDEN_NAMESPACES) + 1
+
 
 def validate_wikipedia_url(url):
     """
@@ -37,85 +147,349 @@ def validate_wikipedia_url(url):
     Returns:
         tuple: (is_valid: bool, error_message: str)
     """
-    if not url:
-        return False, "URL is required"
+    # None・空文字・空白のみの入力を strip() せずに判定する
+    if not url or not isinstance(url, str) or url.isspace():
+        return _RESULT_REQUIRED
     
     # Strip whitespace
     url = url.strip()
-    if not url:
-        return False, "URL is required"
     
-    try:
-        parsed = urlparse(url)
-    except Exception:
-        return False, "Invalid URL format"
+    # 極端に長い入力は以降の処理を行わずに拒否
+    if len(url) > MAX_URL_LENGTH:
+        return _RESULT_TOO_LONG
     
-    # Check if URL uses HTTPS
-    if parsed.scheme != 'https':
-        return False, "URL must use HTTPS"
+    return _validate_stripped_url(url)
+
+
+def validate_many(urls):
+    """
+    複数のURLをまとめて検証する
+    
+    Args:
+        urls (iterable): 検証するURLの列
+        
+    Returns:
+        list: 各URLに対する (is_valid: bool, error_message: str) のリスト
+    """
+    # ループ内でのグローバル名前解決を避けるためローカルに束縛する
+    validate = validate_wikipedia_url
+    return [validate(url) for url in urls]
+
+
+@lru_cache(maxsize=2048)
+def _validate_stripped_url(url):
+    """
+    validate_wikipedia_url の本体（純粋関数のため結果をキャッシュする）
+    
+    Args:
+        url (str): 前後の空白を除去済みのURL
+        
+    Returns:
+        tuple: (is_valid: bool, error_message: str)
+    """
+    # 印字可能な文字だけのURL（通常のURL）は制御文字の処理を省く
+    if not url.isprintable():
+        # urlsplit と同様にタブ・改行を取り除く（"Spe\ncial:" などで名前空間チェックを回避させない）
+        url = url.translate(_URL_REMOVED_CHARS)
+        
+        # それ以外の制御文字を含むURLは不正として拒否する
+        if url.translate(_URL_CONTROL_CHARS) != url:
+            return _RESULT_INVALID_FORMAT
+    
+    # 安価な前方一致・部分一致チェックで大半の不正URLをパース前に弾く
+    if url[:6].lower() != 'https:':
+        return _RESULT_HTTPS
+    
+    if '.wikipedia.org' not in url:
+        return _RESULT_DOMAIN
+    
+    # "https://" の直後からホスト部を切り出す（urlsplit より軽量な手動スライス）
+    if url[6:8] != '//':
+        return _RESULT_DOMAIN
+    
+    netloc_end = len(url)
+    for delimiter in '/?#':
+        index = url.find(delimiter, 8, netloc_end)
+        if index != -1:
+            netloc_end = index
+    netloc = url[8:netloc_end]
+    
+    # 角括弧（IPv6リテラル）を含むホストは urlsplit が ValueError にするため不正なURLとして扱う
+    if '[' in netloc or ']' in netloc:
+        return _RESULT_INVALID_FORMAT
     
     # Check if domain is Wikipedia
-    if not parsed.netloc.endswith('.wikipedia.org'):
-        return False, "URL must be from Wikipedia (*.wikipedia.org)"
+    if not netloc.endswith('.wikipedia.org'):
+        return _RESULT_DOMAIN
     
     # Check for mobile or commons subdomains
-    if parsed.netloc.startswith('m.') or parsed.netloc.startswith('commons.'):
-        return False, "Mobile and Commons Wikipedia URLs are not supported"
+    result = _UNSUPPORTED_SUBDOMAINS.get(netloc.partition('.')[0])
+    if result:
+        return result
+    
+    # クエリ・フラグメントを除いたパス部分
+    path = url[netloc_end:].partition('#')[0].partition('?')[0]
+    
+    # urlparse と同様に最後のセグメントの ";" 以降（パラメータ）を除く
+    params_index = path.find(';', path.rfind('/'))
+    if params_index != -1:
+        path = path[:params_index]
     
     # robots.txt禁止パスの詳細チェック
-    if not parsed.path.startswith('/wiki/'):
-        return False, "URL must be a Wikipedia article (/wiki/article_name)"
+    for prefix, result in _FORBIDDEN_PATH_PREFIXES.items():
+        if path.startswith(prefix):
+            return result
     
-    # /w/ パスは robots.txt で禁止されている
-    if parsed.path.startswith('/w/'):
-        return False, "Access to /w/ paths is prohibited by robots.txt"
+    if not path.startswith('/wiki/'):
+        return _RESULT_ARTICLE_PATH
     
-    # /api/ パスも禁止
-    if parsed.path.startswith('/api/'):
-        return False, "Access to /api/ paths is prohibited by robots.txt"
+    # Extract article name
+    article_name = path[6:]  # Remove '/wiki/' prefix
+    if not article_name:
+        return _RESULT_ARTICLE_NAME
+    
+    # 名前空間の区切り（":" またはエンコードされた "%3A"）を探す
+    # 長いタイトルでも先頭の一定範囲しか走査しない
+    separator_index = article_name.find(':', 0, _NAMESPACE_SCAN_LIMIT)
+    if '%' in article_name:
+        for encoded_separator in _ENCODED_NAMESPACE_SEPARATORS:
+            search_end = separator_index if separator_index != -1 else _NAMESPACE_SCAN_LIMIT
+            index = article_name.find(encoded_separator, 0, search_end)
+            if index != -1:
+                separator_index = index
+    if separator_index == -1:
+        return _RESULT_VALID
+    
+    # Check for forbidden namespaces (robots.txt compliance)
+    # デコードは記事名全体ではなく名前空間部分のみに行う
+    namespace = article_name[:separator_index]
+    if '%' in namespace:
+        namespace = unquote(namespace)
+    result = _FORBIDDEN_NAMESPACES.get(namespace.casefold())
+    if result:
+        return result
+    
+    return _RESULT_VALID
+
+
+@dataclass(slots=True)
+class TocItem:
+    """
+    目次の1項目（orjsonはdataclassをそのままJSONオブジェクトとして出力する）
+    """
+    level: int
+    title: str
+    anchor: str
+    href: str
+
+
+class _AnchorTranslationTable(dict):
+    """
+    アンカーに使えない文字（英数字・ひらがな・カタカナ・漢字以外）を "_" に置き換える str.translate 用の表
     
-    # /trap/ パスも禁止
-    if parsed.path.startswith('/trap/'):
-        return False, "Access to /trap/ paths is prohibited by robots.txt"
+    初めて現れた文字のみ判定し、結果を保持する
+    """
     
-    # Extract article name and decode URL encoding
-    article_name = unquote(parsed.path[6:])  # Remove '/wiki/' prefix and decode
+    def __missing__(self, codepoint):
+        char = chr(codepoint)
+        if (char.isalnum() or char == '_'
+                or '\u3040' <= char <= '\u309F'  # ひらがな
+                or '\u30A0' <= char <= '\u30FF'  # カタカナ
+                or '\u4E00' <= char <= '\u9FAF'):  # 漢字
+            replacement = codepoint
+        else:
+            replacement = '_'
+        self[codepoint] = replacement
+        return replacement
+
+
+# 見出しテキストからアンカーを生成するための変換表
+_ANCHOR_TRANSLATION = _AnchorTranslationTable()
+
+
+def _has_class(class_name):
+    """
+    class属性に指定のクラスを含む要素を選ぶXPath述語を返す
     
-    if not article_name:
-        return False, "Article name is required"
-    
-    # Check for forbidden paths (robots.txt compliance)
-    forbidden_patterns = [
-        r'^Special:',           # Special pages
-        r'^特別:',              # Special pages (Japanese)
-        r'^User:',              # User pages
-        r'^利用者:',            # User pages (Japanese)
-        r'^User_talk:',         # User talk pages
-        r'^利用者‐会話:',       # User talk pages (Japanese)
-        r'^Wikipedia:',         # Wikipedia namespace
-        r'^ノート:',            # Talk pages (Japanese)
-        r'^Talk:',              # Talk pages (English)
-        r'^ファイル:',          # File pages (Japanese)
-        r'^File:',              # File pages (English)
-        r'^Media:',             # Media pages
-        r'^カテゴリ:',          # Category pages (Japanese)
-        r'^Category:',          # Category pages (English)
-        r'^Template:',          # Template pages
-        r'^Help:',              # Help pages
-        r'^Portal:',            # Portal pages
-        r'^Draft:',             # Draft pages
-        r'^Book:',              # Book pages
-        r'^Module:',            # Module pages
-        r'^MediaWiki:',         # MediaWiki namespace
-        r'^Project:',           # Project pages
-    ]
-    
-    for pattern in forbidden_patterns:
-        if re.match(pattern, article_name, re.IGNORECASE):
-            pattern_name = pattern.replace('^', '').replace(':', '')
-            return False, f"Access to {pattern_name} pages is prohibited by Wikipedia's robots.txt"
-    
-    return True, ""
+    Args:
+        class_name (str): クラス名
+        
+    Returns:
+        str: XPath述語
+    """
+    return f'contains(concat(" ", normalize-space(@class), " "), " {class_name} ")'
+
+
+def _article_name_from_url(url):
+    """
+    URLから記事名（/wiki/ 以降をデコードしたもの）を取り出す
+    
+    Args:
+        url (str): 検証済みのWikipedia article URL
+        
+    Returns:
+        str: 記事名
+    """
+    article_name = url.partition('/wiki/')[2].partition('#')[0].partition('?')[0]
+    return unquote(article_name) if '%' in article_name else article_name
+
+
+# 目次抽出で使うXPath（モジュール読み込み時に一度だけコンパイルする）
+_XPATH_TITLE_BY_CLASS = etree.XPath(f'//h1[{_has_class("firstHeading")}]')
+_XPATH_TITLE_BY_ID = etree.XPath('//h1[@id="firstHeading"]')
+_XPATH_LINKS = etree.XPath('.//a')
+_XPATH_TOC_TEXT = etree.XPath(f'.//span[{_has_class("toctext")}]')
+_XPATH_HEADINGS = etree.XPath('//h2 | //h3 | //h4 | //h5 | //h6')
+_XPATH_EDIT_SECTIONS = etree.XPath(f'.//span[{_has_class("mw-editsection")}]')
+
+# 表示されるテキストノード（script・style・template の中身は含めない）
+_XPATH_VISIBLE_TEXT = etree.XPath(
+    './/text()[not(ancestor::script or ancestor::style or ancestor::template)]',
+    smart_strings=False,
+)
+
+
+def _text(element):
+    """
+    要素内の表示されるテキストノードを連結する（各ノードの前後の空白を除き、連続する空白は1つにまとめる）
+    
+    script・style・template 要素の中身は含めない。
+    
+    Args:
+        element: lxmlの要素
+        
+    Returns:
+        str: 連結したテキスト
+    """
+    # split()/join() で前後の空白除去と空白の正規化をノードごとに一度で行う
+    return ''.join(' '.join(text.split()) for text in _XPATH_VISIBLE_TEXT(element))
+
+
+def _declared_charset(head):
+    """
+    本文の先頭から meta 要素で宣言された文字エンコーディングを取り出す
+    
+    Args:
+        head (bytes): 本文の先頭部分
+        
+    Returns:
+        str or None: 宣言されたエンコーディング（未宣言・未知の名前ならNone）
+    """
+    declared = _META_CHARSET_RE.search(head)
+    if not declared:
+        return None
+    
+    charset = declared.group(1).decode('ascii')
+    try:
+        codecs.lookup(charset)
+    except LookupError:
+        return None
+    return charset
+
+
+def _remaining_body_bytes(response):
+    """
+    Content-Length から未受信の本文のバイト数（転送時のエンコードのまま）を求める
+    
+    Args:
+        response (requests.Response): stream=True で取得したレスポンス
+        
+    Returns:
+        int or None: 未受信のバイト数（Content-Length がなければNone）
+    """
+    try:
+        content_length = int(response.headers['Content-Length'])
+    except (KeyError, ValueError):
+        return None
+    return content_length - response.raw.tell()
+
+
+def _parse_html_stream(response):
+    """
+    レスポンス本文を受信しながら逐次パースする（本文全体をメモリに溜めない）
+    
+    最初の目次（div#toc）から目次項目が取れた時点でパースを打ち切る。
+    目次がない・目次項目が取れないページは見出しから目次を作るため、MAX_RESPONSE_BYTES まで読む。
+    
+    Args:
+        response (requests.Response): stream=True で取得したレスポンス
+        
+    Returns:
+        tuple: (ドキュメントのルート要素: lxml.html.HtmlElement, 目次項目: list,
+                目次項目が取れないまま上限で打ち切ったか: bool)
+    """
+    chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+    
+    # ヘッダーで charset が指定されていなければ本文先頭の meta charset に従う（宣言がなければUTF-8）
+    encoding = response.encoding
+    if encoding is None:
+        head = []
+        head_size = 0
+        for chunk in chunks:
+            head.append(chunk)
+            head_size += len(chunk)
+            if head_size >= _META_CHARSET_SCAN_BYTES:
+                break
+        encoding = _declared_charset(b''.join(head)[:_META_CHARSET_SCAN_BYTES]) or 'utf-8'
+        chunks = chain(head, chunks)
+    
+    # フィード中に失敗したパーサーを再利用しないよう、リクエストごとに生成する
+    parser = etree.HTMLPullParser(events=('end',), tag='div', encoding=encoding)
+    parser.set_element_class_lookup(html.HtmlElementClassLookup())
+    
+    toc_items = None  # 最初の div#toc が閉じるまではNone
+    truncated = False
+    received = 0
+    for chunk in chunks:
+        parser.feed(chunk)
+        received += len(chunk)
+        for _, element in parser.read_events():
+            if toc_items is None and element.get('id') == 'toc':
+                toc_items = _extract_toc_items(element)
+        if toc_items:
+            break
+        
+        # 巨大なページは上限までで打ち切り、読めた範囲の見出しを使う（本文が残っていれば打ち切りとして扱う）
+        if received >= MAX_RESPONSE_BYTES:
+            truncated = next(chunks, None) is not None
+            break
+    
+    # 目次で打ち切った場合、残りが少なければパースせずに読み捨てて接続をセッションのプールに戻す
+    # 残りが多い・長さが分からない場合は読まずに閉じ、転送量の削減を優先する（次回は新しい接続になる）
+    if toc_items:
+        remaining = _remaining_body_bytes(response)
+        if remaining is not None and remaining <= KEEPALIVE_DRAIN_BYTES:
+            for _ in chunks:
+                pass
+    
+    # 未終了のタグはパーサーが閉じる
+    try:
+        doc = parser.close()
+    except (etree.ParserError, etree.XMLSyntaxError):
+        doc = None
+    
+    # 空・空白のみの本文は要素のない空のドキュメントとして扱う（タイトル "Unknown"、目次なし）
+    if doc is None:
+        doc = html.Element('html')
+    
+    return doc, toc_items or [], truncated
+
+
+def _wait_for_rate_limit(host):
+    """
+    同じホストへの前回のリクエストから MIN_REQUEST_INTERVAL 秒経つまでだけ待機する
+    
+    初めてのホストや、間隔が十分空いている場合は待たない。
+    
+    Args:
+        host (str): リクエスト先のホスト名
+    """
+    last_request_at = _last_request_at.get(host)
+    if last_request_at is not None:
+        wait = MIN_REQUEST_INTERVAL - (time.monotonic() - last_request_at)
+        if wait > 0:
+            time.sleep(wait)
+    _last_request_at[host] = time.monotonic()
 
 
 def get_heading_level_from_tag(tag):
@@ -123,13 +497,13 @@ def get_heading_level_from_tag(tag):
     HTMLタグから見出しレベルを取得する
     
     Args:
-        tag: BeautifulSoupのタグオブジェクト
+        tag: lxmlの要素
         
     Returns:
         int: 見出しレベル (1-6)
     """
-    if tag.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-        return int(tag.name[1])
+    if tag.tag in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
+        return int(tag.tag[1])
     return 1
 
 
@@ -138,45 +512,72 @@ def get_heading_level_from_toc_item(link):
     目次アイテムから階層レベルを取得する
     
     Args:
-        link: BeautifulSoupのリンク要素
+        link: lxmlのリンク要素
         
     Returns:
         int: 階層レベル（1-6）
     """
-    # 親要素を辿ってレベルを判定
-    parent_li = link.find_parent('li')
-    if parent_li:
+    # 親要素を辿ってレベルを判定（Wikipediaの目次では a は li の直下にある）
+    parent_li = link.getparent()
+    if parent_li is None or parent_li.tag != 'li':
+        parent_li = next(link.iterancestors('li'), None)
+    if parent_li is not None:
         # class名からレベルを推定 (toclevel-1, toclevel-2, など)
-        class_names = parent_li.get('class', [])
-        for class_name in class_names:
-            if class_name.startswith('toclevel-'):
-                try:
-                    level = int(class_name.split('-')[1])
-                    return level
-                except (IndexError, ValueError):
-                    pass
-    
-    # フォールバック: ul要素のネストレベルをカウント
-    current = link
-    level_found = 1
-    
-    for i in range(5):  # 最大5階層上まで検索
-        current = current.parent
-        if not current:
+        toc_level = _TOC_LEVEL_CLASS_RE.search(parent_li.get('class') or '')
+        if toc_level:
+            return int(toc_level.group(1))
+    
+    # フォールバック: ul要素のネストレベルを祖先を一度だけ辿ってカウント
+    ul_depth = 0
+    for distance, ancestor in enumerate(link.iterancestors(), 1):
+        if ancestor.tag == 'ul':
+            ul_depth += 1
+        elif ul_depth == 0 and distance >= 5:  # 最大5階層上までにulがなければ打ち切る
             break
+    
+    return max(ul_depth, 1)
+
+
+def _extract_toc_items(toc_elem):
+    """
+    目次（div#toc）の要素から目次項目を取り出す
+    
+    Args:
+        toc_elem: 目次のlxml要素
+        
+    Returns:
+        list: TocItem のリスト（ページ内リンクがなければ空）
+    """
+    toc_items = []
+    
+    for link in _XPATH_LINKS(toc_elem):
+        href = link.get('href', '')
+        
+        if href.startswith('#'):
+            level = get_heading_level_from_toc_item(link)
             
-        if current.name == 'ul':
-            # ul要素のネストレベルをカウント
-            ul_count = 0
-            temp = current
-            while temp:
-                temp = temp.find_parent('ul')
-                if temp:
-                    ul_count += 1
-            level_found = ul_count + 1
-            break
+            # テキスト抽出
+            text_elems = _XPATH_TOC_TEXT(link)
+            if text_elems:
+                text = _text(text_elems[0])
+            else:
+                text = _text(link)
+            
+            # 先頭の数字とドットを除去 (例: "1.2.3 タイトル" -> "タイトル")
+            number_prefix = _TOC_NUMBER_PREFIX_RE.match(text)
+            if number_prefix:
+                text = text[number_prefix.end():]
+            
+            # 目次自体の項目を除外
+            if text.lower() in ['目次', 'contents', 'table of contents'] or not text:
+                continue
+            
+            # アンカーの清理
+            anchor = href[1:]  # '#'を除去
+            
+            toc_items.append(TocItem(level, text, anchor, href))
     
-    return level_found
+    return toc_items
 
 
 def scrape_wikipedia_toc(url, debug=False):
@@ -191,106 +592,59 @@ def scrape_wikipedia_toc(url, debug=False):
         dict: TOC information or error
     """
     try:
-        # レート制限：最小1秒待機
-        time.sleep(MIN_REQUEST_INTERVAL)
-        
-        # robots.txt準拠のUser-Agentでリクエスト
-        response = requests.get(url, headers=HEADERS, timeout=15)
-        response.raise_for_status()
+        # レート制限：同じホストへの前回のリクエストから最小1秒空ける
+        _wait_for_rate_limit(urlsplit(url).netloc)
         
-        # 文字エンコーディングを適切に設定
-        if response.encoding is None or response.encoding == 'ISO-8859-1':
-            response.encoding = 'utf-8'
-        
-        # HTMLをパース
-        soup = BeautifulSoup(response.content, 'lxml')
+        # robots.txt準拠のUser-Agentでリクエスト（本文はストリーミングで受信）
+        with _SESSION.get(url, timeout=15, stream=True) as response:
+            response.raise_for_status()
+            
+            # 文字エンコーディングを適切に設定
+            # ヘッダーに charset がない場合（requests の既定値 ISO-8859-1）は本文の meta charset から判定する
+            if response.encoding == 'ISO-8859-1' and 'charset' not in response.headers.get('Content-Type', '').lower():
+                response.encoding = None
+            
+            # 受信したチャンクから順にHTMLをパースし、目次項目も取り出す
+            doc, toc_items, truncated = _parse_html_stream(response)
         
         # ページタイトルを取得
-        title_elem = soup.find('h1', {'class': 'firstHeading'})
-        if not title_elem:
-            title_elem = soup.find('h1', {'id': 'firstHeading'})
-        title = title_elem.get_text().strip() if title_elem else "Unknown"
-        
-        # 目次を取得
-        toc_items = []
-        
-        # 標準的な目次テーブルから取得
-        toc_elem = soup.find('div', {'id': 'toc'})
-        
-        if toc_elem:
-            toc_links = toc_elem.find_all('a')
-            
-            for link in toc_links:
-                href = link.get('href', '')
-                
-                if href.startswith('#'):
-                    level = get_heading_level_from_toc_item(link)
-                    
-                    # テキスト抽出
-                    text_elem = link.find('span', class_='toctext')
-                    if text_elem:
-                        text = text_elem.get_text(strip=True)
-                    else:
-                        text = link.get_text(strip=True)
-                    
-                    # 先頭の数字とドットを除去 (例: "1.2.3 タイトル" -> "タイトル")
-                    text = re.sub(r'^\d+(\.\d+)*\s*', '', text)
-                    
-                    # 不要な空白を清理し、余分なスペースを除去
-                    text = re.sub(r'\s+', ' ', text).strip()
-                    
-                    # 目次自体の項目を除外
-                    if text.lower() in ['目次', 'contents', 'table of contents'] or not text:
-                        continue
-                    
-                    # アンカーの清理
-                    anchor = href[1:]  # '#'を除去
-                    
-                    item = {
-                        "level": level,
-                        "title": text,
-                        "anchor": anchor,
-                        "href": href
-                    }
-                    toc_items.append(item)
+        title_elems = _XPATH_TITLE_BY_CLASS(doc)
+        if not title_elems:
+            title_elems = _XPATH_TITLE_BY_ID(doc)
+        title = ''.join(_XPATH_VISIBLE_TEXT(title_elems[0])).strip() if title_elems else "Unknown"
         
         # 目次が見つからない場合、見出しタグから直接取得
         if not toc_items:
-            headings = soup.find_all(['h2', 'h3', 'h4', 'h5', 'h6'])
+            headings = _XPATH_HEADINGS(doc)
             
             for heading in headings:
                 # 編集リンクを除外
-                edit_links = heading.find_all('span', {'class': 'mw-editsection'})
+                edit_links = _XPATH_EDIT_SECTIONS(heading)
                 for edit_link in edit_links:
-                    edit_link.decompose()
+                    edit_link.drop_tree()
                 
-                # テキスト抽出と清理
-                text = heading.get_text(strip=True)
-                text = re.sub(r'\s+', ' ', text)  # 複数の空白を単一のスペースに
+                # テキスト抽出と清理（空白の正規化を含む）
+                text = _text(heading)
                 
                 if text and not text.startswith('[編集]') and text.lower() not in ['目次', 'contents']:
                     # IDからアンカーを生成
                     anchor_id = heading.get('id', '')
                     if not anchor_id:
                         # IDがない場合、テキストからアンカーを生成
-                        anchor_id = re.sub(r'[^\w\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FAF]', '_', text)
+                        anchor_id = text.translate(_ANCHOR_TRANSLATION)
                     
                     level = get_heading_level_from_tag(heading)
                     
-                    item = {
-                        "level": level,
-                        "title": text,
-                        "anchor": anchor_id,
-                        "href": f"#{anchor_id}"
-                    }
-                    toc_items.append(item)
+                    toc_items.append(TocItem(level, text, anchor_id, f"#{anchor_id}"))
         
         return {
             "success": True,
             "url": url,
+            "article_name": _article_name_from_url(url),
             "title": title,
             "toc": toc_items,
-            "total_items": len(toc_items)
+            "total_items": len(toc_items),
+            "truncated": truncated  # Trueなら上限以降の見出しは含まれない
         }
         
     except requests.exceptions.Timeout:
@@ -318,23 +672,22 @@ def print_toc_simple(toc_items):
     目次をシンプルに表示する
     
     Args:
-        toc_items (list): 目次項目のリスト
+        toc_items (list): 目次項目（TocItem）のリスト
     """
     if not toc_items:
         print("目次が見つかりませんでした。")
         return
     
-    print("=" * 60)
-    print("目次")
-    print("=" * 60)
+    separator = "=" * 60
+    lines = [separator, "目次", separator]
+    
+    # インデントを階層レベルに応じて調整
+    lines.extend(f"{'  ' * (item.level - 1)}• {item.title}" for item in toc_items)
     
-    for item in toc_items:
-        # インデントを階層レベルに応じて調整
-        indent = "  " * (item['level'] - 1)
-        title = item['title']
-        print(f"{indent}• {title}")
+    lines.append(separator)
     
-    print("=" * 60)
+    # 1項目ずつではなく、まとめて一度だけ出力する
+    print("\n".join(lines))
 
 
 def print_toc_detailed(toc_items):
@@ -342,28 +695,22 @@ def print_toc_detailed(toc_items):
     目次を詳細表示する（レベル、アンカー付き）
     
     Args:
-        toc_items (list): 目次項目のリスト
+        toc_items (list): 目次項目（TocItem）のリスト
     """
     if not toc_items:
         print("目次が見つかりませんでした。")
         return
     
-    print("=" * 80)
-    print("目次（詳細表示）")
-    print("=" * 80)
+    separator = "=" * 80
     
+    entries = []
     for i, item in enumerate(toc_items, 1):
-        indent = "  " * (item['level'] - 1)
-        title = item['title']
-        level = item['level']
-        href = item['href']
-        
-        print(f"{i:2d}. {indent}[H{level}] {title}")
-        print(f"     {indent}    -> {href}")
-        if i < len(toc_items):
-            print()
+        indent = "  " * (item.level - 1)
+        entries.append(f"{i:2d}. {indent}[H{item.level}] {item.title}\n"
+                       f"     {indent}    -> {item.href}")
     
-    print("=" * 80)
+    # 項目間は空行で区切り、まとめて一度だけ出力する
+    print("\n".join((separator, "目次（詳細表示）", separator, "\n\n".join(entries), separator)))
 
 
 def export_to_json(result, filename=None):
@@ -376,16 +723,14 @@ def export_to_json(result, filename=None):
     """
     if not filename:
         # URLからファイル名を生成
-        if result.get('success') and result.get('url'):
-            parsed = urlparse(result['url'])
-            article_name = unquote(parsed.path[6:])  # Remove '/wiki/' prefix
-            filename = f"{article_name}_toc.json"
+        if result.get('success') and result.get('article_name'):
+            filename = f"{result['article_name']}_toc.json"
         else:
             filename = "wikipedia_toc.json"
     
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2))
         print(f"\n結果を {filename} に保存しました。")
     except Exception as e:
         print(f"\nJSONファイル保存エラー: {e}")
@@ -431,6 +776,8 @@ def main():
     print(f"\n✓ 抽出完了")
     print(f"ページタイトル: {result['title']}")
     print(f"目次項目数: {result['total_items']}")
+    if result['truncated']:
+        print(f"注意: ページが大きいため先頭 {MAX_RESPONSE_BYTES} バイトまでの見出しのみ抽出しました")
     
     if result['toc']:
         # シンプル表示
@@ -459,94 +806,215 @@ def main():
         print("目次が見つかりませんでした。")
 
 
-def lambda_handler(event, context):
+# APIレスポンス共通ヘッダー
+_RESPONSE_HEADERS = {
+    "Content-Type": "application/json; charset=utf-8",
+    "Access-Control-Allow-Origin": "*"
+}
+
+# 成功・スクレイピング結果のレスポンスヘッダー
+_CACHEABLE_RESPONSE_HEADERS = {
+    **_RESPONSE_HEADERS,
+    "Cache-Control": "public, max-age=300"  # 5分間キャッシュ
+}
+
+# クエリパラメータがないイベント用（呼び出しごとに空dictを作らない）
+_EMPTY_QUERY = {}
+
+
+def _json_body(payload):
     """
-    Lambda function to validate Wikipedia URLs and return TOC information.
-    シンプルな教育用API実装
+    レスポンス本文用にJSON文字列へ変換する（orjsonは空白なしのUTF-8 bytesを返す）
+    
+    Args:
+        payload (dict): レスポンス本文
+        
+    Returns:
+        str: JSON文字列
     """
+    return orjson.dumps(payload).decode('utf-8')
+
+
+def _api_response(status_code, headers, body):
+    """
+    API Gatewayレスポンスを組み立てる
     
-    try:
-        # HTTPメソッドのチェック
-        http_method = event.get('httpMethod', 'GET')
-        if http_method != 'GET':
-            return {
-                "statusCode": 405,
-                "headers": {
-                    "Content-Type": "application/json",
-                    "Access-Control-Allow-Origin": "*"
-                },
-                "body": json.dumps({
-                    "success": False,
-                    "error": "Method not allowed",
-                    "message": "Only GET method is supported"
-                })
-            }
+    呼び出し側やミドルウェアが変更しても共有の定数に影響しないよう、ヘッダーも含めて毎回新しいdictを返す。
+    
+    Args:
+        status_code (int): HTTPステータスコード
+        headers (dict): レスポンスヘッダー（コピーして使う）
+        body (str): JSON文字列の本文
         
-        # Get URL from query parameters
-        query_params = event.get('queryStringParameters') or {}
-        url = query_params.get('url')
+    Returns:
+        dict: API Gatewayレスポンス
+    """
+    return {
+        "statusCode": status_code,
+        "headers": dict(headers),
+        "body": body
+    }
+
+
+# 入力に依存しないエラーレスポンスの本文はモジュール読み込み時に一度だけシリアライズする
+_BODY_METHOD_NOT_ALLOWED = _json_body({
+    "success": False,
+    "error": "Method not allowed",
+    "message": "Only GET method is supported"
+})
+
+_BODY_URL_REQUIRED = _json_body({
+    "success": False,
+    "error": "URL parameter is required",
+    "message": "Please provide a Wikipedia URL using ?url=<wikipedia_url>",
+    "example": "?url=https://ja.wikipedia.org/wiki/Amazon_Web_Services"
+})
+
+
+def _toc_response(result):
+    """
+    目次の抽出結果からAPI Gatewayレスポンスを組み立てる
+    
+    Args:
+        result (dict): scrape_wikipedia_toc の戻り値
         
-        if not url:
-            return {
-                "statusCode": 400,
-                "headers": {
-                    "Content-Type": "application/json; charset=utf-8",
-                    "Access-Control-Allow-Origin": "*"
-                },
-                "body": json.dumps({
-                    "success": False,
-                    "error": "URL parameter is required",
-                    "message": "Please provide a Wikipedia URL using ?url=<wikipedia_url>",
-                    "example": "?url=https://ja.wikipedia.org/wiki/Amazon_Web_Services"
-                }, ensure_ascii=False)
-            }
+    Returns:
+        dict: API Gatewayレスポンス
+    """
+    # ステータスコードの決定
+    status_code = 200 if result["success"] else 500
+    if not result["success"] and "timeout" in result.get("error", "").lower():
+        status_code = 504
+    
+    # 途中で打ち切った不完全な目次はクライアント側でもキャッシュさせない
+    headers = _RESPONSE_HEADERS if result.get("truncated") else _CACHEABLE_RESPONSE_HEADERS
+    
+    return _api_response(status_code, headers, _json_body(result))
+
+
+# URL -> (有効期限, シリアライズ済みのレスポンス)（呼び出し側に返したものとは別のdictを保持する）
+_TOC_CACHE = {}
+
+
+def _copy_response(response):
+    """
+    API Gatewayレスポンスをヘッダーも含めて複製する（本文は不変の文字列のため共有する）
+    
+    Args:
+        response (dict): API Gatewayレスポンス
         
-        # Validate Wikipedia URL
-        is_valid, error_message = validate_wikipedia_url(url)
+    Returns:
+        dict: 複製したAPI Gatewayレスポンス
+    """
+    return _api_response(response["statusCode"], response["headers"], response["body"])
+
+
+def _toc_response_cached(url):
+    """
+    目次のレスポンスをTTL付きのLRUでキャッシュする（成功時のみ）
+    
+    キャッシュヒット時は抽出もJSONへの変換もやり直さず、保持しているレスポンスの複製を返す。
+    
+    Args:
+        url (str): 検証済みのWikipedia article URL
         
-        if not is_valid:
-            return {
-                "statusCode": 400,
-                "headers": {
-                    "Content-Type": "application/json; charset=utf-8",
-                    "Access-Control-Allow-Origin": "*"
-                },
-                "body": json.dumps({
-                    "success": False,
-                    "error": "Invalid Wikipedia URL",
-                    "message": error_message,
-                    "provided_url": url
-                }, ensure_ascii=False)
-            }
+    Returns:
+        dict: API Gatewayレスポンス
+    """
+    now = time.monotonic()
+    cached = _TOC_CACHE.pop(url, None)
+    if cached and cached[0] > now:
+        # 末尾に入れ直し、最近使ったエントリほど後ろに並べる
+        _TOC_CACHE[url] = cached
+        return _copy_response(cached[1])
+    
+    result = scrape_wikipedia_toc(url, debug=False)  # 本番環境ではデバッグ無効
+    response = _toc_response(result)
+    # 途中で打ち切った不完全な目次はキャッシュしない
+    if result["success"] and not result["truncated"]:
+        # 上限に達したら最も長く使われていないエントリを捨てる
+        if len(_TOC_CACHE) >= TOC_CACHE_MAX_ENTRIES:
+            del _TOC_CACHE[next(iter(_TOC_CACHE))]
+        _TOC_CACHE[url] = (now + TOC_CACHE_TTL, _copy_response(response))
+    return response
+
+
+def _parse_event(event):
+    """
+    API Gatewayのイベントから必要な値だけを一度で取り出す
+    
+    Args:
+        event (dict): API Gatewayのイベント
         
-        # Scrape TOC information
-        result = scrape_wikipedia_toc(url, debug=False)  # 本番環境ではデバッグ無効
+    Returns:
+        tuple: (http_method: str, url: str or None)
+    """
+    query_params = event.get('queryStringParameters') or _EMPTY_QUERY
+    return event.get('httpMethod', 'GET'), query_params.get('url')
+
+
+def _handle_get(url):
+    """
+    GETリクエストを処理する（URL検証と目次抽出）
+    
+    Args:
+        url (str or None): クエリパラメータで指定されたURL
         
-        # ステータスコードの決定
-        status_code = 200 if result["success"] else 500
-        if not result["success"] and "timeout" in result.get("error", "").lower():
-            status_code = 504
+    Returns:
+        dict: API Gatewayレスポンス
+    """
+    if not url:
+        return _api_response(400, _RESPONSE_HEADERS, _BODY_URL_REQUIRED)
+    
+    # Validate Wikipedia URL
+    is_valid, error_message = validate_wikipedia_url(url)
+    
+    if not is_valid:
+        return _api_response(400, _RESPONSE_HEADERS, _json_body({
+            "success": False,
+            "error": "Invalid Wikipedia URL",
+            "message": error_message,
+            "provided_url": url
+        }))
+    
+    # Scrape TOC information
+    return _toc_response_cached(url)
+
+
+def _handle_method_not_allowed():
+    """
+    GET以外のHTTPメソッドに405を返す
+    
+    Returns:
+        dict: API Gatewayレスポンス
+    """
+    return _api_response(405, _RESPONSE_HEADERS, _BODY_METHOD_NOT_ALLOWED)
+
+
+# HTTPメソッド -> ハンドラー（未登録のメソッドは405）
+_METHOD_HANDLERS = {
+    'GET': _handle_get,
+}
+
+
+def lambda_handler(event, context):
+    """
+    Lambda function to validate Wikipedia URLs and return TOC information.
+    シンプルな教育用API実装
+    """
+    
+    try:
+        http_method, url = _parse_event(event)
         
-        return {
-            "statusCode": status_code,
-            "headers": {
-                "Content-Type": "application/json; charset=utf-8",
-                "Access-Control-Allow-Origin": "*",
-                "Cache-Control": "public, max-age=300"  # 5分間キャッシュ
-            },
-            "body": json.dumps(result, ensure_ascii=False)
-        }
+        # HTTPメソッドに応じたハンドラーを呼び出す
+        handler = _METHOD_HANDLERS.get(http_method)
+        if handler is None:
+            return _handle_method_not_allowed()
+        return handler(url)
         
     except Exception as e:
-        return {
-            "statusCode": 500,
-            "headers": {
-                "Content-Type": "application/json; charset=utf-8",
-                "Access-Control-Allow-Origin": "*"
-            },
-            "body": json.dumps({
-                "success": False,
-                "error": "Internal server error",
-                "message": str(e)
-            }, ensure_ascii=False)
-        }
\ No newline at end of file
+        return _api_response(500, _RESPONSE_HEADERS, _json_body({
+            "success": False,
+            "error": "Internal server error",
+            "message": str(e)
+        }))